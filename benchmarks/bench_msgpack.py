@@ -0,0 +1,108 @@
+"""
+Compares the JSON and MessagePack paths of an echo handler on a large nested payload,
+decoding the request body and encoding the response inside the application
+
+python benchmarks/bench_msgpack.py --items 2000 --number 200
+"""
+import sys
+import json
+import random
+import asyncio
+import argparse
+import timeit
+
+sys.path.insert(0, ".")
+
+from razor.server import Application, Request, JsonResponse, MsgPackResponse  # noqa: E402
+from razor.server.serializers import msgpack_dumps  # noqa: E402
+
+
+def make_payload(items: int):
+    """
+    Records like the ones internal services exchange: ids, strings, floats, flags and nested lists
+    """
+    rng = random.Random(0)
+    return {
+        "request_id": "bench",
+        "items": [
+            {
+                "id": index,
+                "sku": f"SKU-{rng.randrange(10 ** 8):08d}",
+                "name": "item %d" % index,
+                "price": round(rng.uniform(1, 500), 2),
+                "in_stock": rng.random() > 0.2,
+                "tags": [rng.choice(("new", "sale", "eu", "us", "bulk")) for _ in range(3)],
+                "dimensions": {"w": rng.random(), "h": rng.random(), "d": rng.random()},
+                "history": [rng.randrange(1000) for _ in range(10)],
+            }
+            for index in range(items)
+        ],
+    }
+
+
+def make_scope(path: str, content_type: bytes, body: bytes):
+    return {
+        "type": "http",
+        "method": "POST",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "scheme": "http",
+        "http_version": "1.1",
+        "query_string": b"",
+        "headers": [
+            (b"host", b"localhost"),
+            (b"content-type", content_type),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 1),
+        "server": ("127.0.0.1", 80),
+        "state": {},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=2000, help="Records in the payload")
+    parser.add_argument("--number", type=int, default=200, help="Requests per measurement")
+    args = parser.parse_args()
+
+    app = Application(__name__)
+
+    @app.route("/json", methods=["POST"])
+    async def echo_json(request: Request):
+        return JsonResponse(await request.json())
+
+    @app.route("/msgpack", methods=["POST"])
+    async def echo_msgpack(request: Request):
+        return MsgPackResponse(await request.msgpack())
+
+    payload = make_payload(args.items)
+    cases = {
+        "json": ("/json", b"application/json", json.dumps(payload).encode()),
+        "msgpack": ("/msgpack", b"application/msgpack", msgpack_dumps(payload)),
+    }
+
+    async def send(message):
+        pass
+
+    async def run(path, content_type, body):
+        for _ in range(args.number):
+            async def receive():
+                return {"type": "http.request", "body": body, "more_body": False}
+            await app(make_scope(path, content_type, body), receive, send)
+
+    loop = asyncio.new_event_loop()
+    results = {}
+    for name, (path, content_type, body) in cases.items():
+        seconds = min(timeit.repeat(
+            lambda: loop.run_until_complete(run(path, content_type, body)), number=1, repeat=5
+        ))
+        results[name] = seconds
+        print(f"{name:<8} {len(body):>9} bytes  {seconds / args.number * 1000:8.3f}ms per request")
+    loop.close()
+    print(f"msgpack is {results['json'] / results['msgpack']:.2f}x faster")
+
+
+if __name__ == "__main__":
+    main()
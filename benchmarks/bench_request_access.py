@@ -0,0 +1,155 @@
+"""
+Compares reading request attributes through the LocalProxy before request injection, the current LocalProxy
+and a Request injected into the handler
+
+python benchmarks/bench_request_access.py --lookups 30 --number 20000
+"""
+import sys
+import asyncio
+import argparse
+import operator
+import timeit
+from functools import partial
+from contextvars import ContextVar
+
+sys.path.insert(0, ".")
+
+from razor.server import Application, Request, TextResponse  # noqa: E402
+from razor.server.globals import request as current_proxy  # noqa: E402
+from razor.server.context import RequestContext, _cv_request  # noqa: E402
+
+
+class _ProxyLookup:
+    """
+    The LocalProxy lookup before explicit injection, it allocates a partial per access
+    """
+
+    def __init__(self, f):
+        def bind_f(instance, obj):
+            return partial(f, obj)
+        self.bind_f = bind_f
+
+    def __get__(self, instance, owner=None):
+        obj = instance._get_current_object()
+        return self.bind_f(instance, obj)
+
+    def __call__(self, instance, *args, **kwargs):
+        return self.__get__(instance, type(instance))(*args, **kwargs)
+
+
+class OldLocalProxy:
+    def __init__(self, local, proxy):
+        self.local = local
+        self.proxy = proxy
+
+    def _get_current_object(self):
+        if isinstance(self.local, ContextVar):
+            return self.local.get()
+        raise RuntimeError(f"Unsupported local type:{type(self.local)}")
+
+    __getattr__ = _ProxyLookup(getattr)
+    __getitem__ = _ProxyLookup(operator.__getitem__)
+
+
+def make_scope(path="/"):
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "scheme": "http",
+        "http_version": "1.1",
+        "query_string": b"page=1",
+        "headers": [(b"host", b"localhost"), (b"user-agent", b"bench")],
+        "client": ("127.0.0.1", 1),
+        "server": ("127.0.0.1", 80),
+        "state": {},
+    }
+
+
+def bench_lookups(lookups: int, number: int):
+    """
+    The cost of the attribute lookups alone, inside a pushed request context
+    """
+    ctx = RequestContext(make_scope(), None, None)
+    ctx.push()
+    old_proxy = OldLocalProxy(_cv_request, Request)
+    injected = ctx.request
+
+    def run(obj):
+        for _ in range(lookups):
+            obj.method
+            obj.path
+
+    results = {}
+    for name, obj in (("old proxy", old_proxy), ("new proxy", current_proxy), ("injected", injected)):
+        results[name] = min(timeit.repeat(partial(run, obj), number=number, repeat=5))
+    ctx.pop()
+    return results
+
+
+def bench_handlers(lookups: int, number: int):
+    """
+    Full requests through the application, with handlers reading the request lookups times
+    """
+    app = Application(__name__)
+    old_proxy = OldLocalProxy(_cv_request, Request)
+
+    @app.route("/old")
+    async def old():
+        for _ in range(lookups):
+            old_proxy.method
+            old_proxy.path
+        return TextResponse("ok")
+
+    @app.route("/new")
+    async def new():
+        for _ in range(lookups):
+            current_proxy.method
+            current_proxy.path
+        return TextResponse("ok")
+
+    @app.route("/injected")
+    async def injected(request: Request):
+        for _ in range(lookups):
+            request.method
+            request.path
+        return TextResponse("ok")
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    async def run(path):
+        for _ in range(number):
+            await app(make_scope(path), receive, send)
+
+    results = {}
+    loop = asyncio.new_event_loop()
+    for name, path in (("old proxy", "/old"), ("new proxy", "/new"), ("injected", "/injected")):
+        results[name] = min(timeit.repeat(lambda: loop.run_until_complete(run(path)), number=1, repeat=5))
+    loop.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lookups", type=int, default=30, help="Pairs of attribute lookups per handler")
+    parser.add_argument("--number", type=int, default=20000, help="Iterations per measurement")
+    args = parser.parse_args()
+
+    for title, results in (
+        ("attribute lookups", bench_lookups(args.lookups, args.number)),
+        ("requests", bench_handlers(args.lookups, args.number // 10)),
+    ):
+        print(f"{title}:")
+        baseline = results["old proxy"]
+        for name, seconds in results.items():
+            print(f"  {name:<10} {seconds:8.4f}s  {baseline / seconds:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,9 @@ Thanks to the following open source frameworks, Razor has learned a lot from you
 """
 
 from .application import Application
+from .blueprints import Blueprint
+
+from .request import Request
 
 from .globals import (
     request,
@@ -21,9 +24,14 @@ from .response import (
     TextResponse,
     HtmlResponse,
     JsonResponse,
+    MsgPackResponse,
+    StreamResponse,
+    JsonLinesResponse,
     RedirectResponse,
     ErrorResponse
 )
 
+from .templating import TemplateResponse
+
 from .views import View
 from .logs import logger
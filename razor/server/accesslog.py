@@ -0,0 +1,134 @@
+import os
+import sys
+import json
+import time
+import queue
+import random
+import threading
+from typing import Any, Dict, IO, Optional, Union
+
+from .types import AsgiApp, AsgiScope, AsgiReceive, AsgiSend, AsgiMessage
+
+
+class AccessLogger:
+    """
+    Writes one JSON line per request from a background thread, the event loop only builds the record
+
+    sample_rates maps a status code (404) or a status class ("2xx") to the fraction of requests logged,
+    the other statuses use sample_rate
+
+    app.enable_access_log(sample_rate=0.01, sample_rates={"4xx": 0.1, "5xx": 1})
+    """
+
+    # The records waiting for the writer thread, new records are dropped once it is full
+    QUEUE_SIZE = 10000
+
+    def __init__(
+        self,
+        stream: Optional[IO[str]] = None,
+        sample_rate: float = 1.0,
+        sample_rates: Optional[Dict[Union[int, str], float]] = None,
+        queue_size: int = QUEUE_SIZE
+    ):
+        self.stream = stream
+        self.sample_rate = sample_rate
+        self.sample_rates = sample_rates or {}
+        self.dropped = 0
+
+        self._rates: Dict[int, float] = {}
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def get_sample_rate(self, status: int) -> float:
+        rate = self._rates.get(status)
+        if rate is None:
+            rate = self.sample_rates.get(status, self.sample_rates.get(f"{status // 100}xx", self.sample_rate))
+            self._rates[status] = rate
+        return rate
+
+    async def handle(self, asgi_app: AsgiApp, scope: AsgiScope, receive: AsgiReceive, send: AsgiSend):
+        """
+        Runs asgi_app and records the status, the body size and the duration of the two phases:
+        handle until the response starts, send until the body is complete
+        """
+        start = time.perf_counter()
+        response_start = None
+        status = 500
+        size = 0
+
+        async def send_wrapper(message: AsgiMessage):
+            nonlocal response_start, status, size
+            if message["type"] == "http.response.start":
+                response_start = time.perf_counter()
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await asgi_app(scope, receive, send_wrapper)
+        finally:
+            # The client went away before a response, like the 499 of nginx
+            if response_start is None and scope.get("disconnected"):
+                status = 499
+            rate = self.get_sample_rate(status)
+            if rate >= 1 or random.random() < rate:
+                end = time.perf_counter()
+                response_start = response_start or end
+                client = scope.get("client")
+                self.log({
+                    "ts": round(time.time(), 3),
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": scope.get("route"),
+                    "status": int(status),
+                    "bytes": size,
+                    "handle_ms": round((response_start - start) * 1000, 3),
+                    "send_ms": round((end - response_start) * 1000, 3),
+                    "total_ms": round((end - start) * 1000, 3),
+                    "client": f"{client[0]}:{client[1]}" if client else None,
+                })
+
+    def log(self, record: Dict[str, Any]):
+        # The writer thread is started in the process that logs, it does not survive a fork
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._write_records, name="razor-access-log", daemon=True)
+        self._thread.start()
+
+    def _write_records(self):
+        stream = self.stream or sys.stdout
+        while True:
+            records = [self._queue.get()]
+            # Everything that is already queued is written at once
+            while True:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            closing = None in records
+            lines = [json.dumps(record, separators=(",", ":")) for record in records if record is not None]
+            if lines:
+                stream.write("\n".join(lines) + "\n")
+                stream.flush()
+            if closing:
+                return
+
+    def close(self, timeout: float = 5):
+        """
+        Writes the queued records and stops the writer thread
+        """
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.put(None)
+            self._thread.join(timeout)
+        self._thread = None
+        self._pid = None
@@ -1,15 +1,30 @@
 import re
 import shutil
-from typing import Any, Type, Optional, Union, Dict
+import asyncio
+import functools
+from typing import Any, Type, Optional, Union, Dict, List, Tuple, Callable, TYPE_CHECKING
 
-from uvicorn import run as run_server
-
-from .logs import LOGGING_CONFIG
 from .router import Router
-from .events import EventManager
-from .types import AsgiScope, AsgiReceive, AsgiSend
+from .events import EventManager, ALL_HOOKS
+from .caching import MemoizedFunction
+from .draining import RequestTracker
+from .types import AsgiApp, AsgiScope, AsgiReceive, AsgiSend
 from .asgi import AsgiLifespanHandle, AsgiHttpHandle, AsgiWebsocketHandle
 
+if TYPE_CHECKING:
+    from .accesslog import AccessLogger
+    from .forwarding import UpstreamPool
+    from .memprofile import MemoryProfiler
+    from .looplag import LoopMonitor
+    from .cors import CorsPolicy
+    from .sharedmemory import SharedStore
+    from .scheduling import Scheduler, PeriodicJob
+    from .templating import TemplateLoader, TemplateResponse
+
+
+# The default of `Application.run(log_config=...)`, the Razor logging config is only built when it is used
+DEFAULT_LOG_CONFIG: Any = object()
+
 
 class Application:
     """
@@ -29,9 +44,37 @@ class Application:
     ---
     """
 
-    def __init__(self, name, trim_last_slash=False):
+    def __init__(
+        self,
+        name,
+        trim_last_slash=False,
+        max_body_size: Optional[int] = None,
+        body_idle_timeout: Optional[float] = None,
+        body_timeout: Optional[float] = None,
+        max_decompressed_size: Optional[int] = 100 * 1024 * 1024,
+        max_compression_ratio: Optional[float] = 100,
+        on_disconnect: Optional[str] = None,
+        drain_timeout: float = 30,
+        drain_delay: float = 0
+    ):
         """
-        trim_last_slash : Whether the routing system is strictly matched
+        trim_last_slash       : Whether the routing system is strictly matched
+        max_body_size         : The maximum request body size in bytes, larger bodies get a 413 response
+                                it can be overridden per route with `@app.route(..., max_body_size=...)`
+        body_idle_timeout     : The maximum seconds to wait for the next body chunk, a slow client gets a 408 response
+        body_timeout          : The maximum seconds to read the whole body, a slow client gets a 408 response
+        max_decompressed_size : The maximum size of a gzip or deflate request body once decompressed,
+                                larger bodies get a 413 response
+        max_compression_ratio : The maximum ratio of decompressed to compressed size, above it the body
+                                is rejected as a decompression bomb with a 413 response
+        on_disconnect         : How a request notices that its client went away while it is handled,
+                                "flag" sets `request.is_disconnected` and stops streaming responses,
+                                "cancel" also cancels the handler. It can be overridden per route
+                                with `@app.route(..., on_disconnect=...)`, disconnects are not watched by default
+        drain_timeout         : The maximum seconds shutdown waits for the requests and tasks in flight
+        drain_delay           : Seconds between SIGTERM and the shutdown of the server of `app.run`, readiness probes
+                                fail during that time while requests are still served, so the load balancer
+                                stops routing to the worker before its listener closes
         """
         self.name = name
         self.event_manager = EventManager()
@@ -39,10 +82,83 @@ class Application:
 
         self.debug = False
 
+        self.max_body_size = max_body_size
+        self.body_idle_timeout = body_idle_timeout
+        self.body_timeout = body_timeout
+        self.max_decompressed_size = max_decompressed_size
+        self.max_compression_ratio = max_compression_ratio
+        self.on_disconnect = on_disconnect
+        self.drain_timeout = drain_timeout
+        self.drain_delay = drain_delay
+        self.tracker = RequestTracker()
+
+        # Memoized functions are cleared when the application shuts down
+        self.memoized: List[MemoizedFunction] = []
+
+        self.access_logger: Optional["AccessLogger"] = None
+        self.memory_profiler: Optional["MemoryProfiler"] = None
+        self.loop_monitor: Optional["LoopMonitor"] = None
+
+        # The CORS policy of the routes without their own, see app.enable_cors
+        self.cors: Optional["CorsPolicy"] = None
+
+        # Upstream connection pools of app.forward, closed when the application shuts down
+        self.upstream_pools: List["UpstreamPool"] = []
+
+        # The template loader of app.render, see app.configure_templates
+        self.templates: Optional["TemplateLoader"] = None
+
+        # Counters and cached values shared by the workers, see app.enable_shared_store
+        self.shared_store: Optional["SharedStore"] = None
+
+        # The periodic jobs of app.every, run from lifespan startup until shutdown
+        self.scheduler: Optional["Scheduler"] = None
+
+        # ASGI callables that skip the context, hooks and Request of the framework
+        self._bare_routes: Dict[str, AsgiApp] = {}
+        self._mounts: List[Tuple[str, AsgiApp]] = []
+
+        # The middleware stack is composed once, when the first ASGI packet arrives
+        self._middlewares: List[Tuple[Callable[..., AsgiApp], Dict[str, Any]]] = []
+        self._asgi_app: Optional[AsgiApp] = None
+
     async def __call__(self, scope: AsgiScope, receive: AsgiReceive, send: AsgiSend):
         """
         Processing ASGI packets
         """
+        if self._asgi_app is None:
+            self._asgi_app = self._build_middleware_stack()
+        await self._asgi_app(scope, receive, send)
+
+    def _build_middleware_stack(self) -> AsgiApp:
+        """
+        Wraps the application in the middlewares, the first added middleware is the outermost
+        """
+        asgi_app = self._handle
+        for middleware, options in reversed(self._middlewares):
+            asgi_app = middleware(asgi_app, **options)
+        return asgi_app
+
+    async def _handle(self, scope: AsgiScope, receive: AsgiReceive, send: AsgiSend):
+        """
+        Dispatch the ASGI packets to the bare routes, the mounted applications or the framework
+        """
+        if scope["type"] == "http":
+            bare_route = self._bare_routes.get(scope["path"])
+            if bare_route is not None:
+                return await bare_route(scope, receive, send)
+
+        if self._mounts and scope["type"] != "lifespan":
+            path = scope["path"]
+            for prefix, asgi_app in self._mounts:
+                if path == prefix or path.startswith(prefix + "/"):
+                    scope = {
+                        **scope,
+                        "root_path": scope.get("root_path", "") + prefix,
+                        "path": path[len(prefix):] or "/"
+                    }
+                    return await asgi_app(scope, receive, send)
+
         if scope["type"] == "http":
             asgi_handler = AsgiHttpHandle(self)
         elif scope["type"] == "websocket":
@@ -103,6 +219,341 @@ class Application:
         """
         return self.router.add_routes(*routes)
 
+    def register_blueprint(self, blueprint):
+        """
+        Register the routes of a blueprint, its hooks only run for its own routes
+
+        users = Blueprint("users", url_prefix="/users")
+        app.register_blueprint(users)
+        """
+        blueprint.register(self)
+        return blueprint
+
+    def add_middleware(self, middleware: Callable[..., AsgiApp], **options):
+        """
+        Add a pure ASGI middleware, it is called as `middleware(app, **options)`
+        Middlewares must be added before the application receives its first ASGI packet
+
+        class TimingMiddleware:
+            def __init__(self, app):
+                self.app = app
+
+            async def __call__(self, scope, receive, send):
+                ...
+                await self.app(scope, receive, send)
+
+        app.add_middleware(TimingMiddleware)
+        """
+        if self._asgi_app is not None:
+            raise RuntimeError("Cannot add a middleware after the application has started")
+        self._middlewares.append((middleware, options))
+
+    def bare_route(self, *paths):
+        """
+        Register a raw ASGI callable for exact paths and any method
+        The context, hooks, signals and Request of the framework are skipped
+
+        @app.bare_route("/healthz")
+        async def healthz(scope, receive, send):
+            ...
+
+        A prebuilt response is an ASGI callable too:
+            - app.bare_route("/readyz")(TextResponse("ok"))
+        """
+        def wrapper(asgi_app: AsgiApp) -> AsgiApp:
+            for path in paths:
+                self._bare_routes[path] = asgi_app
+            return asgi_app
+        return wrapper
+
+    def add_readiness_route(self, *paths):
+        """
+        Register a readiness probe that skips the framework
+        It answers 200 while the application accepts requests and 503 once it is draining,
+        so the load balancer stops routing to the worker before it shuts down
+
+        app.add_readiness_route("/readyz")
+        """
+        return self.bare_route(*paths)(self.tracker)
+
+    def start_draining(self, reject: bool = True):
+        """
+        Fail readiness probes and, with reject, answer new requests with 503
+        `app.run` starts draining on SIGTERM, and shutdown always drains before its callbacks run
+        """
+        self.tracker.start_draining(reject)
+
+    def create_task(self, coro):
+        """
+        Run background work that shutdown waits for, up to the drain timeout
+
+        app.create_task(send_email(user))
+        """
+        return self.tracker.create_task(coro)
+
+    def enable_access_log(self, **options) -> "AccessLogger":
+        """
+        Log every request as a JSON line written by a background thread, instead of the uvicorn access log
+        The options are passed to `razor.server.accesslog.AccessLogger`
+
+        app.enable_access_log(sample_rate=0.05, sample_rates={"5xx": 1})
+        """
+        from .accesslog import AccessLogger
+
+        if self.access_logger is None:
+            self.event_manager.register("shutdown", self._close_access_log, name="razor.access_log")
+        self.access_logger = AccessLogger(**options)
+        return self.access_logger
+
+    async def _close_access_log(self):
+        await asyncio.to_thread(self.access_logger.close)
+
+    def enable_cors(self, **options) -> "CorsPolicy":
+        """
+        Allow cross-origin requests to every route, a route can override it with `@app.route(..., cors=...)`
+        The options are passed to `razor.server.cors.CorsPolicy`
+
+        Preflights are answered from prebuilt responses before routing, hooks and handlers
+
+        app.enable_cors(allow_origins=["https://example.com"], allow_headers=["content-type"], max_age=3600)
+        """
+        from .cors import CorsPolicy
+
+        self.cors = CorsPolicy(**options)
+        return self.cors
+
+    def enable_batch(self, path: str = "/_batch", **options):
+        """
+        Register a POST route that runs a JSON list of sub-requests concurrently in one HTTP call
+        The options are passed to `razor.server.batching.BatchHandler`
+
+        app.enable_batch("/_batch", max_concurrency=8)
+
+        POST /_batch
+        [{"method": "GET", "path": "/users/1"}, {"method": "POST", "path": "/events", "body": {"type": "open"}}]
+        """
+        from .batching import BatchHandler
+
+        return self.route(path, methods=["POST"])(BatchHandler(self, path, **options))
+
+    def enable_memory_profiling(self, *paths, **options) -> "MemoryProfiler":
+        """
+        Record the memory left allocated by a sample of requests, grouped by route, and the allocation sites
+        that grow between periodic heap snapshots, with tracemalloc
+        The options are passed to `razor.server.memprofile.MemoryProfiler`
+
+        paths are registered as bare routes that return the largest routes and allocation sites as JSON,
+        a POST to them clears the tables. Tracing slows down every allocation, it is meant for diagnostics
+
+        app.enable_memory_profiling("/_debug/memory", sample_rate=0.01)
+        """
+        from .memprofile import MemoryProfiler
+
+        if self.memory_profiler is None:
+            self.event_manager.register("startup", self._start_memory_profiling, name="razor.memory_profile")
+            self.event_manager.register("shutdown", self._stop_memory_profiling, name="razor.memory_profile")
+        self.memory_profiler = MemoryProfiler(**options)
+        if paths:
+            self.bare_route(*paths)(self.memory_profiler)
+        return self.memory_profiler
+
+    async def _start_memory_profiling(self):
+        self.memory_profiler.start()
+
+    async def _stop_memory_profiling(self):
+        await self.memory_profiler.stop()
+
+    def forward(self, prefix: str, upstream: str, methods=None, **pool_options) -> "UpstreamPool":
+        """
+        Forward every request under prefix to an upstream server through a pool of keep-alive connections
+        The request and response bodies are streamed, the hooks of the application still run
+
+        methods      : The forwarded methods, all of them by default
+        pool_options : max_connections, connect_timeout, read_timeout and idle_timeout of the pool
+
+        app.forward("/api", "http://127.0.0.1:8000/v1", max_connections=32)
+        """
+        from .request import Request
+        from .forwarding import UpstreamPool, ProxyResponse
+
+        if not self.upstream_pools:
+            self.event_manager.register("shutdown", self._close_upstream_pools, name="razor.forward")
+        pool = UpstreamPool(upstream, **pool_options)
+        self.upstream_pools.append(pool)
+
+        async def forward(request: Request, path=""):
+            return ProxyResponse(pool, request, path=f"/{path}" if path else "")
+
+        prefix = prefix.rstrip("/")
+        self.route(
+            prefix or "/",
+            f"{prefix}/{{path:path}}",
+            methods=list(methods or ("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"))
+        )(forward)
+        return pool
+
+    async def _close_upstream_pools(self):
+        for pool in self.upstream_pools:
+            await pool.close()
+
+    def enable_loop_monitor(self, *paths, **options) -> "LoopMonitor":
+        """
+        Measure the lag of the event loop and log the stack and the route of handlers that block it
+        The options are passed to `razor.server.looplag.LoopMonitor`
+
+        paths are registered as bare routes that return the lag histogram and the recent stalls as JSON
+
+        app.enable_loop_monitor("/_debug/loop", threshold=0.1)
+        """
+        from .looplag import LoopMonitor
+
+        if self.loop_monitor is None:
+            self.event_manager.register("startup", self._start_loop_monitor, name="razor.loop_monitor")
+            self.event_manager.register("shutdown", self._stop_loop_monitor, name="razor.loop_monitor")
+        self.loop_monitor = LoopMonitor(**options)
+        if paths:
+            self.bare_route(*paths)(self.loop_monitor)
+        return self.loop_monitor
+
+    async def _start_loop_monitor(self):
+        self.loop_monitor.start()
+
+    async def _stop_loop_monitor(self):
+        await self.loop_monitor.stop()
+
+    def configure_templates(self, directory, **options) -> "TemplateLoader":
+        """
+        Load the templates of app.render from directory, it requires the optional `jinja2` package
+        The options are passed to `razor.server.templating.TemplateLoader`
+
+        Each template is compiled once and cached, in debug mode it is compiled again when its file changes
+
+        app.configure_templates("templates")
+        """
+        from .templating import TemplateLoader
+
+        self.templates = TemplateLoader(directory, **options)
+        return self.templates
+
+    def get_template(self, name: str):
+        if self.templates is None:
+            raise RuntimeError("Templates are not configured, call `app.configure_templates(directory)` first")
+        return self.templates.get_template(name, self.debug)
+
+    def render(self, name: str, context=None, *, stream: bool = False, **kwargs) -> "TemplateResponse":
+        """
+        Render a template into a response, with stream=True the page is sent while it renders
+
+        @app.route("/")
+        async def index():
+            return app.render("index.html", {"title": "Razor"})
+        """
+        from .templating import TemplateResponse
+
+        return TemplateResponse(self.get_template(name), context, stream=stream, **kwargs)
+
+    def enable_shared_store(self, **options) -> "SharedStore":
+        """
+        Share counters and small cached values between the worker processes of the machine
+        The options are passed to `razor.server.sharedmemory.SharedStore`
+
+        The prefork runner creates the store before forking, each worker attaches it at lifespan startup
+        and exposes it as `request.state["shared_store"]`
+
+        store = app.enable_shared_store(counters=1024, slots=4096)
+
+        @app.route("/hits")
+        async def hits():
+            return TextResponse(str(store.incr("hits")))
+        """
+        from .sharedmemory import SharedStore
+
+        if self.shared_store is None:
+            self.event_manager.register("startup", self._attach_shared_store, name="razor.shared_store")
+        self.shared_store = SharedStore(**options)
+        return self.shared_store
+
+    async def _attach_shared_store(self, state):
+        self.shared_store.attach()
+        state["shared_store"] = self.shared_store
+
+    def memoize(self, ttl: float = 60, maxsize: int = 1024, stale_ttl: Optional[float] = None, key=None):
+        """
+        Cache the results of an async function in a bounded LRU with a TTL, cleared on shutdown
+        Concurrent calls with the same arguments share a single call
+
+        ttl       : Seconds a result is fresh
+        maxsize   : The maximum number of cached results, the least recently used are evicted
+        stale_ttl : Seconds an expired result is still returned while it is refreshed in the background
+        key       : A function that builds the cache key from the arguments, they must be hashable by default
+
+        @app.memoize(ttl=30, maxsize=512)
+        async def get_permissions(user_id):
+            ...
+
+        get_permissions.stats() -> {"hits": ..., "misses": ..., "evictions": ..., ...}
+        """
+        def wrapper(func) -> MemoizedFunction:
+            if not self.memoized:
+                self.event_manager.register("shutdown", self._clear_memoized, name="razor.memoize")
+            memoized = MemoizedFunction(func, ttl=ttl, maxsize=maxsize, stale_ttl=stale_ttl, key=key)
+            self.memoized.append(memoized)
+            return memoized
+        return wrapper
+
+    async def _clear_memoized(self):
+        for memoized in self.memoized:
+            memoized.cache_clear()
+
+    def every(
+        self,
+        seconds: float,
+        *,
+        jitter: float = 0,
+        timeout: Optional[float] = None,
+        leader_only: bool = False,
+        name: Optional[str] = None
+    ):
+        """
+        Run an async function every `seconds` in the event loop of the application, from lifespan startup
+        until shutdown, where it is cancelled. A run that is still going when the next one is due skips it,
+        a failed run is logged and the job goes on. The jobs start once the other startup callbacks
+        are complete, so the state they set up is ready for the first run
+
+        jitter      : Up to that many seconds are added to each delay, so workers do not run all at once
+        timeout     : Seconds after which a run is cancelled
+        leader_only : Run the job in a single worker process of the machine
+        name        : The name of the job in the metrics, defaults to the function name
+
+        @app.every(60, jitter=5, timeout=30, leader_only=True)
+        async def refresh_leaderboard(state):
+            state["leaderboard"] = await compute_leaderboard(state["db"])
+
+        app.scheduler.metrics() -> {"refresh_leaderboard": {"runs": ..., "skipped": ..., ...}}
+        """
+        from .scheduling import Scheduler, PeriodicJob
+
+        def wrapper(func) -> "PeriodicJob":
+            if self.scheduler is None:
+                self.scheduler = Scheduler(self.name)
+                self.event_manager.register(
+                    "startup", self.scheduler.start, name="razor.scheduler", requires=ALL_HOOKS)
+                self.event_manager.register("shutdown", self.scheduler.stop, name="razor.scheduler")
+            return self.scheduler.add(PeriodicJob(
+                func, seconds, jitter=jitter, timeout=timeout, leader_only=leader_only, name=name
+            ))
+        return wrapper
+
+    def mount(self, prefix: str, asgi_app: AsgiApp):
+        """
+        Mount an ASGI application under a path prefix, its requests skip the framework entirely
+        The prefix is moved from `path` to `root_path` in the scope
+
+        app.mount("/metrics", metrics_app)
+        """
+        self._mounts.append((prefix.rstrip("/"), asgi_app))
+        return asgi_app
+
     def on_event(self, event):
         """
         Register event callback
@@ -115,25 +566,47 @@ class Application:
             return self.event_manager.register(event, callback)
         return fn
 
-    def on_startup(self, callback):
+    def on_startup(self, callback=None, *, name=None, requires=(), timeout=None):
         """
         A startup callback function that registers lifespan
+        Startup callbacks run concurrently, a callback starts once the callbacks it requires are complete
+
+        name     : The name used by `requires`, defaults to the function name
+        requires : The names of startup callbacks that must be completed first,
+                   "*" waits for every startup callback that does not itself require "*"
+        timeout  : The maximum number of seconds the callback can run
 
         @app.on_startup
         async def startup():
             ...
+
+        A callback that accepts a parameter receives the lifespan state,
+        which is available to every request as `request.state`
+
+        @app.on_startup(requires=["database"], timeout=10)
+        async def cache(state):
+            state["cache"] = await Cache.connect(state["pool"])
         """
-        return self.event_manager.register("startup", callback)
+        if callback is None:
+            return functools.partial(self.on_startup, name=name, requires=requires, timeout=timeout)
+        return self.event_manager.register("startup", callback, name=name, requires=requires, timeout=timeout)
 
-    def on_shutdown(self, callback):
+    def on_shutdown(self, callback=None, *, name=None, requires=(), timeout=None):
         """
         A shutdown callback function that registers lifespan
+        It supports the same options as `on_startup`
 
         @app.on_shutdown
         async def shutdown():
             ...
+
+        @app.on_shutdown(requires=["cache"], timeout=5)
+        async def close_database(state):
+            await state["pool"].close()
         """
-        return self.event_manager.register("shutdown", callback)
+        if callback is None:
+            return functools.partial(self.on_shutdown, name=name, requires=requires, timeout=timeout)
+        return self.event_manager.register("shutdown", callback, name=name, requires=requires, timeout=timeout)
 
     def on_before_request(self, callback):
         """
@@ -176,16 +649,30 @@ class Application:
         ssl_ca_certs: Optional[str] = None,
         ssl_certfile: Optional[str] = None,
         ssl_keyfile: Optional[str] = None,
-        log_config: Optional[Union[Dict[str, Any], str]] = LOGGING_CONFIG,
+        log_config: Optional[Union[Dict[str, Any], str]] = DEFAULT_LOG_CONFIG,
         workers: Optional[int] = None,
         access_log: bool = True,
+        reuse_port: bool = False,
         **kwargs: Any
     ):
         """
         Razor's startup function
         the specific parameters can be viewed in [uvicorn settings](https://www.uvicorn.org/settings/).
+
+        When the application object itself is passed with workers > 1, it is imported once
+        and the workers are forked from it, see `razor.server.runner.PreforkRunner`
+        reuse_port : The forked workers bind their own socket with SO_REUSEPORT
         """
+        # uvicorn is only needed here, importing it lazily keeps `import razor.server` cheap
+        from uvicorn import run as run_server
+        from .logs import LOGGING_CONFIG
+
         self.debug = debug
+        # None keeps meaning "do not configure logging", as in uvicorn
+        if log_config is DEFAULT_LOG_CONFIG:
+            log_config = LOGGING_CONFIG
+        # The access log of Razor replaces the one of uvicorn
+        access_log = access_log and self.access_logger is None
         app = app or self
 
         terminal_width, _ = shutil.get_terminal_size()
@@ -198,23 +685,47 @@ class Application:
         print(f"* Running on \033[1m{scheme}://{host}:{port}\033[0m (CTRL + C to quit)")
 
         if not isinstance(app, str):
-            if reload or workers:
-                print("* You must pass the application as an import string to enable 'reload' or 'workers")
-            workers = 1
+            if reload:
+                print("* You must pass the application as an import string to enable 'reload'")
             reload = False
 
+            if workers and workers > 1:
+                from .runner import PreforkRunner
+
+                print(f"* Preforking {workers} workers from the imported application")
+                print(stars)
+                PreforkRunner(
+                    app,
+                    host=host,
+                    port=port,
+                    workers=workers,
+                    reuse_port=reuse_port,
+                    ssl_certfile=ssl_certfile,
+                    ssl_keyfile=ssl_keyfile,
+                    ssl_ca_certs=ssl_ca_certs,
+                    log_config=log_config,
+                    access_log=access_log,
+                    **kwargs
+                ).run()
+                return
+            workers = 1
+
         print(stars)
 
-        run_server(
-            app,
+        config = dict(
             host=host,
             port=port,
-            reload=reload,
             ssl_certfile=ssl_certfile,
             ssl_keyfile=ssl_keyfile,
             ssl_ca_certs=ssl_ca_certs,
             log_config=log_config,
-            workers=workers,
             access_log=access_log,
             **kwargs
         )
+        if reload or (workers and workers > 1):
+            # The processes of uvicorn import the application again, they drain from lifespan shutdown
+            run_server(app, reload=reload, workers=workers, **config)
+        else:
+            from .runner import serve
+
+            serve(self, app, **config)
@@ -1,17 +1,51 @@
+import asyncio
 import functools
-from typing import TYPE_CHECKING
+from typing import Optional, Tuple, TYPE_CHECKING
 
 from . import signals
 from .logs import logger
+from .context import ApplicationContext, RequestContext
+from .cors import CorsPolicy, get_cors_headers, add_headers
+from .disconnect import DisconnectWatcher
 from .response import Response, ErrorResponse, HTTPStatus
 from .types import AsgiScope, AsgiReceive, AsgiSend, AsgiMessage
-from .exceptions import NotFoundException, InvalidMethodException
+from .exceptions import (
+    RouterException,
+    NotFoundException,
+    InvalidMethodException,
+    RequestEntityTooLargeException,
+    RequestTimeoutException,
+    RequestDecodingException,
+    UnsupportedContentEncodingException
+)
 
 
 if TYPE_CHECKING:
     from .application import Application
 
 
+@functools.lru_cache(maxsize=None)
+def prebuilt_error_response(status_code: int, headers: Tuple[Tuple[str, str], ...] = ()) -> ErrorResponse:
+    """
+    Error responses that are sent without running user code are built once and reused
+    """
+    return ErrorResponse(status_code, headers=headers)
+
+
+def skip_body(send: AsgiSend) -> AsgiSend:
+    """
+    HEAD responses keep the headers of the GET response, including its content-length, but send no body
+    """
+    async def send_wrapper(message: AsgiMessage):
+        if message["type"] == "http.response.body":
+            if message.get("more_body", False):
+                return
+            message = {"type": "http.response.body", "body": b""}
+        await send(message)
+
+    return send_wrapper
+
+
 class AsgiLifespanHandle:
     """
     Manage the lifecycle of ASGI
@@ -24,7 +58,6 @@ class AsgiLifespanHandle:
         """
         Create a application context object
         """
-        from .context import ApplicationContext
         return ApplicationContext(self.app)
 
     async def __call__(self, scope: AsgiScope, receive: AsgiReceive, send: AsgiSend):
@@ -35,23 +68,29 @@ class AsgiLifespanHandle:
         ctx = self._make_app_context()
         ctx.push()
 
+        # The server copies the lifespan state into the scope of every request
+        state = scope.setdefault("state", {})
+
         while True:
             message = await receive()
             # The application starts
             if message["type"] == "lifespan.startup":
-                asgi_message = await self._callback_fn_("startup")
+                self.app.tracker.reset()
+                asgi_message = await self._callback_fn_("startup", state)
                 await send(asgi_message)
             # The application closes
             elif message["type"] == "lifespan.shutdown":
-                asgi_message = await self._callback_fn_("shutdown")
+                # The shutdown callbacks run once the work in flight is done or the drain timeout is reached
+                await self.app.tracker.drain(self.app.drain_timeout)
+                asgi_message = await self._callback_fn_("shutdown", state)
                 await send(asgi_message)
                 break
 
         ctx.pop()
 
-    async def _callback_fn_(self, event: str) -> AsgiMessage:
+    async def _callback_fn_(self, event: str, state) -> AsgiMessage:
         try:
-            await self.app.event_manager.run_callback(event)
+            await self.app.event_manager.run_lifespan(event, state)
         except Exception as exc:
             return {"type": f"lifespan.{event}.failed", "message": str(exc)}
         return {"type": f"lifespan.{event}.complete"}
@@ -65,12 +104,11 @@ class AsgiHttpHandle:
         """
         Create a request context object
         """
-        from .context import RequestContext
         return RequestContext(scope, receive, send)
 
-    async def _run_handler(self, handle):
+    async def _run_handler(self, hooks, handle):
 
-        before_response = await self.app.event_manager.run_callback("before_request")
+        before_response = await hooks.run_callback("before_request")
         if isinstance(before_response, Response):
             return before_response
 
@@ -78,7 +116,7 @@ class AsgiHttpHandle:
 
         if isinstance(handle_response, Response):
 
-            callback_response = await self.app.event_manager.run_callback("after_request", handle_response)
+            callback_response = await hooks.run_callback("after_request", handle_response)
             if isinstance(callback_response, Response):
                 return callback_response
             return handle_response
@@ -89,30 +127,121 @@ class AsgiHttpHandle:
         return ErrorResponse(status_code=HTTPStatus.INTERNAL_SERVER_ERROR)
 
     async def __call__(self, scope: AsgiScope, receive: AsgiReceive, send: AsgiSend):
+        tracker = self.app.tracker
+        # A draining application does not accept new requests
+        if tracker.rejecting:
+            response = prebuilt_error_response(
+                HTTPStatus.SERVICE_UNAVAILABLE,
+                (("connection", "close"), ("retry-after", "1"))
+            )
+            return await response(scope, receive, send)
+
+        if self.app.cors is not None or self.app.router.has_cors:
+            origin, preflight_method, request_headers = get_cors_headers(scope)
+            if origin is not None:
+                policy = self._get_cors_policy(scope)
+                if policy:
+                    # Preflights are answered from the prebuilt responses, no handler or hook runs
+                    if preflight_method is not None and scope["method"] == "OPTIONS":
+                        response = policy.preflight_response(origin, preflight_method, request_headers)
+                        return await response(scope, receive, send)
+                    send = add_headers(send, policy.response_headers(origin))
+
+        handle = self._handle
+        if self.app.memory_profiler is not None:
+            handle = functools.partial(self.app.memory_profiler.handle, handle)
+
+        tracker.inflight += 1
+        try:
+            if self.app.access_logger is None:
+                await handle(scope, receive, send)
+            else:
+                await self.app.access_logger.handle(handle, scope, receive, send)
+        finally:
+            tracker.inflight -= 1
+
+    def _get_cors_policy(self, scope: AsgiScope) -> Optional[CorsPolicy]:
+        if not self.app.router.has_cors:
+            return self.app.cors
+        try:
+            # The router adds OPTIONS to the routes, so a preflight matches the route it announces
+            match = self.app.router(scope["path"], scope["method"])
+        except RouterException:
+            return self.app.cors
+        return getattr(match.target, "__cors__", self.app.cors)
+
+    async def _handle(self, scope: AsgiScope, receive: AsgiReceive, send: AsgiSend):
 
         ctx = self._make_req_context(scope, receive, send)
         ctx.push()
+        request = ctx.request
+        request.body_idle_timeout = self.app.body_idle_timeout
+        request.body_timeout = self.app.body_timeout
+        request.max_decompressed_size = self.app.max_decompressed_size
+        request.max_compression_ratio = self.app.max_compression_ratio
         path, method = scope["path"], scope["method"]
-        await signals.request_start.send_async(self.app)
+        await signals.send_async("request_start", self.app)
+        # Routes registered by a blueprint carry their own hook chain
+        hooks = self.app.event_manager
+        response = watcher = None
         try:
             match = self.app.router(path, method)
-            match.target.path_params = match.params or {}
-            response = await self._run_handler(functools.partial(match.target, **match.target.path_params))
+            hooks = getattr(match.target, "__hooks__", hooks)
+            scope["route"] = getattr(match.target, "__route_template__", None)
+            request.max_body_size = getattr(match.target, "__max_body_size__", self.app.max_body_size)
+            # A body declared larger than the limit is rejected before hooks or handler run
+            request.check_content_length()
+            on_disconnect = getattr(match.target, "__on_disconnect__", self.app.on_disconnect)
+            if on_disconnect is not None:
+                watcher = DisconnectWatcher(scope, receive, on_disconnect == "cancel", self.app.tracker)
+                request.receive = receive = watcher.receive
+                watcher.start()
+            match.target.path_params = params = match.params or {}
+            # Handlers that declare a Request parameter receive it directly instead of using the proxy
+            request_param = getattr(match.target, "__request_param__", None)
+            if request_param is not None:
+                params = {**params, request_param: request}
+            response = await self._run_handler(hooks, functools.partial(match.target, **params))
+            # A template renders here, so its errors reach the exception hooks like those of the handler
+            await response.prepare()
+        except asyncio.CancelledError:
+            # Only the cancellation of a handler whose client went away is handled here
+            if watcher is None or not watcher.disconnected:
+                raise
+            watcher.uncancel()
         except NotFoundException as exc:
             response = ErrorResponse(HTTPStatus.NOT_FOUND)
         except InvalidMethodException as exc:
             response = ErrorResponse(status_code=HTTPStatus.METHOD_NOT_ALLOWED)
+        except RequestEntityTooLargeException:
+            response = prebuilt_error_response(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        except RequestTimeoutException:
+            response = prebuilt_error_response(HTTPStatus.REQUEST_TIMEOUT)
+        except RequestDecodingException:
+            response = prebuilt_error_response(HTTPStatus.BAD_REQUEST)
+        except UnsupportedContentEncodingException:
+            response = prebuilt_error_response(HTTPStatus.UNSUPPORTED_MEDIA_TYPE)
         except Exception as exc:
-            response = await self.app.event_manager.run_callback("exception", exc)
+            response = await hooks.run_callback("exception", exc)
             # If a Type[Exception] is not returned, the exception is logged and handled by the framework itself
             if not isinstance(response, Response):
                 logger.exception(exc)
                 response = ErrorResponse(status_code=HTTPStatus.INTERNAL_SERVER_ERROR)
         finally:
-            await response(scope, receive, send)
-            await signals.request_finish.send_async(self.app, response=response)
-            # cleans up the context object
-            ctx.pop()
+            try:
+                if response is not None:
+                    await response(scope, receive, skip_body(send) if method == "HEAD" else send)
+            except asyncio.CancelledError:
+                if watcher is None or not watcher.disconnected:
+                    raise
+                watcher.uncancel()
+            finally:
+                if watcher is not None:
+                    watcher.stop()
+                # Runs even when sending the response fails
+                await signals.send_async("request_finish", self.app, response=response)
+                # cleans up the context object
+                ctx.pop()
 
 
 class AsgiWebsocketHandle:
@@ -0,0 +1,169 @@
+import json
+import base64
+import asyncio
+from http import HTTPStatus
+from urllib.parse import urlencode
+from typing import Any, AsyncIterator, Dict, List, TYPE_CHECKING
+
+from .request import Request
+from .response import Response, JsonResponse, JsonLinesResponse
+from .types import AsgiScope, AsgiMessage
+
+if TYPE_CHECKING:
+    from .application import Application
+
+
+# Headers of the batch request that describe its own body, they are never inherited by a sub-request
+BODY_HEADERS = frozenset((b"content-length", b"content-type", b"content-encoding", b"transfer-encoding"))
+
+
+class BatchHandler:
+    """
+    Runs the sub-requests of one HTTP request through the router, hooks and handlers of the application
+
+    The body is a JSON list of sub-requests:
+        [{"method": "GET", "path": "/users/1", "query": {"fields": "name"}, "headers": {...}, "body": ...}]
+
+    Every sub-request gets its own request context, it inherits the headers of the batch request
+    except the ones describing the body. A JSON body is sent as application/json.
+    The results are returned in order as a JSON list, or as NDJSON lines in completion order
+    when the batch request accepts application/x-ndjson, each result has the index of its sub-request
+
+    max_concurrency : The number of sub-requests that run at the same time
+    max_requests    : The maximum number of sub-requests in one batch
+    """
+
+    def __init__(self, app: "Application", path: str, max_concurrency: int = 8, max_requests: int = 50):
+        self.app = app
+        self.path = path
+        self.max_concurrency = max_concurrency
+        self.max_requests = max_requests
+
+    async def __call__(self, request: Request) -> Response:
+        # Checked on the scope rather than the path, every path that routes here is refused
+        if request.scope.get("razor.batch"):
+            return self.error(HTTPStatus.BAD_REQUEST, "A batch cannot contain a batch")
+        try:
+            sub_requests = await request.json()
+        except ValueError:
+            return self.error(HTTPStatus.BAD_REQUEST, "The batch body is not valid JSON")
+        if not isinstance(sub_requests, list) or not all(isinstance(item, dict) for item in sub_requests):
+            return self.error(HTTPStatus.BAD_REQUEST, "The batch body must be a list of sub-requests")
+        if len(sub_requests) > self.max_requests:
+            return self.error(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"A batch has at most {self.max_requests} sub-requests")
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = [
+            asyncio.ensure_future(self.run(index, item, request.scope, semaphore))
+            for index, item in enumerate(sub_requests)
+        ]
+
+        if "application/x-ndjson" in request.headers.get("accept", ""):
+            return JsonLinesResponse(self._as_completed(tasks))
+        return JsonResponse(await asyncio.gather(*tasks))
+
+    @staticmethod
+    def error(status: HTTPStatus, message: str) -> JsonResponse:
+        return JsonResponse({"error": message}, status_code=status.value)
+
+    @staticmethod
+    async def _as_completed(tasks: List[asyncio.Future]) -> AsyncIterator[Dict[str, Any]]:
+        try:
+            for result in asyncio.as_completed(tasks):
+                yield await result
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def run(self, index: int, item: Dict[str, Any], parent: AsgiScope, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            try:
+                scope, body = self.make_scope(item, parent)
+            except (TypeError, ValueError) as exc:
+                return {"index": index, "status": HTTPStatus.BAD_REQUEST.value, "error": str(exc)}
+            return {"index": index, **await self.dispatch(scope, body)}
+
+    def make_scope(self, item: Dict[str, Any], parent: AsgiScope):
+        path = item.get("path")
+        if not isinstance(path, str) or not path.startswith("/"):
+            raise ValueError("The path of a sub-request must start with /")
+
+        query = item.get("query") or ""
+        if isinstance(query, dict):
+            query = urlencode(query, doseq=True)
+
+        sub_headers = [
+            (str(key).lower().encode("latin-1"), str(value).encode("latin-1"))
+            for key, value in (item.get("headers") or {}).items()
+        ]
+        overridden = {key for key, _ in sub_headers}
+        headers = [(key, value) for key, value in parent["headers"] if key not in overridden | BODY_HEADERS]
+        # The body is framed again below, only its content-type is kept
+        headers.extend(
+            (key, value) for key, value in sub_headers if key == b"content-type" or key not in BODY_HEADERS
+        )
+
+        body = item.get("body")
+        if body is None:
+            body = b""
+        elif isinstance(body, str):
+            body = body.encode("utf-8")
+        else:
+            body = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            if b"content-type" not in overridden:
+                headers.append((b"content-type", b"application/json"))
+        if body:
+            headers.append((b"content-length", str(len(body)).encode("latin-1")))
+
+        scope = {
+            **parent,
+            "method": str(item.get("method", "GET")).upper(),
+            "path": path,
+            "raw_path": path.encode("utf-8"),
+            "query_string": query.encode("latin-1"),
+            "headers": headers,
+            "razor.batch": True,
+        }
+        scope.pop("route", None)
+        return scope, body
+
+    async def dispatch(self, scope: AsgiScope, body: bytes) -> Dict[str, Any]:
+        from .asgi import AsgiHttpHandle
+
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+        status = HTTPStatus.INTERNAL_SERVER_ERROR.value
+        response_headers = []
+        chunks = []
+
+        async def receive() -> AsgiMessage:
+            if messages:
+                return messages.pop()
+            # A sub-request has no connection, it is never disconnected
+            await asyncio.Future()
+
+        async def send(message: AsgiMessage):
+            nonlocal status, response_headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await AsgiHttpHandle(self.app)(scope, receive, send)
+
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in response_headers}
+        return {"status": int(status), "headers": headers, **self.decode_body(headers, b"".join(chunks))}
+
+    @staticmethod
+    def decode_body(headers: Dict[str, str], body: bytes) -> Dict[str, Any]:
+        content_type = headers.get("content-type", "")
+        if content_type.startswith("application/json"):
+            try:
+                return {"body": json.loads(body)}
+            except ValueError:
+                pass
+        try:
+            return {"body": body.decode("utf-8")}
+        except UnicodeDecodeError:
+            return {"body": base64.b64encode(body).decode("ascii"), "encoding": "base64"}
@@ -0,0 +1,140 @@
+import re
+from typing import Callable, List, TYPE_CHECKING
+
+from .events import EventManager, HookChain
+
+if TYPE_CHECKING:
+    from .router import Router
+    from .application import Application
+
+
+class Blueprint:
+    """
+    A group of routes that share a url prefix and their own request hooks
+    The hooks of a blueprint only run for its own routes, after the hooks of the application
+
+    ---
+    from razor.server import Application, Blueprint, JsonResponse
+
+    users = Blueprint("users", url_prefix="/users")
+
+    @users.on_before_request
+    async def authenticate():
+        ...
+
+    @users.route("/{user_id:int}")
+    async def detail(user_id):
+        return JsonResponse({"id": user_id})
+
+    app = Application(__name__)
+    app.register_blueprint(users)
+    ---
+    """
+
+    def __init__(self, name: str, url_prefix: str = ""):
+        """
+        url_prefix : The prefix added to the path of every route in the blueprint
+        """
+        self.name = name
+        self.url_prefix = url_prefix.rstrip("/")
+        self.event_manager = EventManager()
+
+        # Routes are bound to the router of the application when the blueprint is registered
+        self._deferred: List[Callable[["Router", HookChain], None]] = []
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.name}>"
+
+    def _prefix_path(self, path):
+        # Regex paths are compiled with the prefix already applied by re_route
+        if isinstance(path, str):
+            return self.url_prefix + path
+        return path
+
+    def route(self, *paths, methods=None, **opts):
+        """
+        Normal mode routing, the paths are relative to url_prefix
+
+        @blueprint.route('/index')
+        """
+        def wrapper(target):
+            def deferred(router: "Router", hooks: HookChain):
+                router.route(
+                    *(self._prefix_path(path) for path in paths),
+                    methods=methods and list(methods),
+                    hooks=hooks,
+                    **opts
+                )(target)
+
+            self._deferred.append(deferred)
+            return target
+
+        return wrapper
+
+    def re_route(self, *paths, methods=None, **opts):
+        """
+        Regex mode routing, the patterns are relative to url_prefix
+
+        @blueprint.re_route('/regexp/\\w{3}-\\d{2}/?')
+        """
+        return self.route(
+            *(re.compile(re.escape(self.url_prefix) + path) for path in paths),
+            methods=methods,
+            **opts
+        )
+
+    def add_routes(self, *routes):
+        """
+        Add routing relationship mappings in the normal way, the paths are relative to url_prefix
+
+          - blueprint.add_routes(
+                ("/help/", "/doc/", doc),      # fbv
+                ("/test/", Example.as_view()), # cbv
+            )
+        """
+        def deferred(router: "Router", hooks: HookChain):
+            router.add_routes(
+                *((*(self._prefix_path(path) for path in paths), handle) for *paths, handle in routes),
+                hooks=hooks
+            )
+
+        self._deferred.append(deferred)
+
+    def on_before_request(self, callback):
+        """
+        Register a callback function when a request to the blueprint arrives
+
+        @blueprint.on_before_request
+        async def before_request():
+            ...
+        """
+        return self.event_manager.register("before_request", callback)
+
+    def on_after_request(self, callback):
+        """
+        Register a callback function when a request to the blueprint leave
+
+        @blueprint.on_after_request
+        async def after_request(resp) -> Response | None:
+            ...
+        """
+        return self.event_manager.register("after_request", callback)
+
+    def on_exception(self, callback):
+        """
+        Registers a callback function when a route of the blueprint throws an exception
+        It runs before the exception callbacks of the application
+
+        @blueprint.on_exception
+        async def exception_handle(exc) -> Response | None:
+            ...
+        """
+        return self.event_manager.register("exception", callback)
+
+    def register(self, app: "Application"):
+        """
+        Binds the routes to the application together with their hook chain
+        """
+        hooks = HookChain(app.event_manager, self.event_manager)
+        for deferred in self._deferred:
+            deferred(app.router, hooks)
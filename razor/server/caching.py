@@ -0,0 +1,121 @@
+import time
+import asyncio
+import functools
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from .logs import logger
+
+
+class MemoizedFunction:
+    """
+    An async function whose results are cached in a bounded LRU with a TTL
+
+    Concurrent calls with the same key share a single in-flight call.
+    With stale_ttl, an expired result is still returned for stale_ttl seconds
+    while a single background call refreshes it.
+    """
+
+    def __init__(
+        self,
+        func: Callable,
+        ttl: float,
+        maxsize: int,
+        stale_ttl: Optional[float] = None,
+        key: Optional[Callable[..., Hashable]] = None
+    ):
+        self.func = func
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.stale_ttl = stale_ttl
+        self.key = key or self.make_key
+
+        # key -> (result, expires at)
+        self._cache: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        functools.update_wrapper(self, func)
+
+    @staticmethod
+    def make_key(*args, **kwargs) -> Hashable:
+        if kwargs:
+            return args, tuple(sorted(kwargs.items()))
+        return args
+
+    async def __call__(self, *args, **kwargs):
+        key = self.key(*args, **kwargs)
+        entry = self._cache.get(key)
+
+        if entry is not None:
+            result, expires = entry
+            now = time.monotonic()
+            if now < expires:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                return result
+            if self.stale_ttl is not None and now < expires + self.stale_ttl:
+                self.stale_hits += 1
+                self._cache.move_to_end(key)
+                self._load(key, args, kwargs, background=True)
+                return result
+            del self._cache[key]
+
+        self.misses += 1
+        # shield keeps the shared call running when one of its callers is cancelled
+        return await asyncio.shield(self._load(key, args, kwargs))
+
+    def _load(self, key: Hashable, args, kwargs, background: bool = False) -> asyncio.Future:
+        """
+        Returns the in-flight call for key, starting one if there is none
+        """
+        future = self._inflight.get(key)
+        if future is None:
+            future = self._inflight[key] = asyncio.ensure_future(self._run(key, args, kwargs))
+            future.add_done_callback(functools.partial(self._done, key, background))
+        return future
+
+    async def _run(self, key: Hashable, args, kwargs):
+        result = await self.func(*args, **kwargs)
+        self._cache[key] = (result, time.monotonic() + self.ttl)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+            self.evictions += 1
+        return result
+
+    def _done(self, key: Hashable, background: bool, future: asyncio.Future):
+        # After cache_clear a newer call for the same key may be in flight, it is left alone
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if future.cancelled():
+            return
+        exc = future.exception()
+        # Failed background refreshes have no caller to receive the exception
+        if exc is not None and background:
+            logger.error(
+                f"Background refresh of {self.func.__qualname__} failed: {exc!r}",
+                exc_info=(type(exc), exc, exc.__traceback__))
+
+    def cache_clear(self):
+        self._cache.clear()
+        for future in self._inflight.values():
+            future.cancel()
+        self._inflight.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._cache),
+            "maxsize": self.maxsize,
+        }
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.func.__qualname__}>"
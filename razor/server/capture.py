@@ -0,0 +1,167 @@
+import os
+import time
+import base64
+import random
+import asyncio
+import hashlib
+from urllib.parse import unquote_plus
+from typing import Any, Dict, Iterable, IO, Optional, Union
+
+from .accesslog import AccessLogger
+from .types import AsgiApp, AsgiScope, AsgiReceive, AsgiSend, AsgiMessage
+
+
+# Headers that carry credentials, they are never written to a capture file
+SECRET_HEADERS = frozenset((
+    b"authorization",
+    b"proxy-authorization",
+    b"cookie",
+    b"x-api-key",
+    b"x-auth-token",
+))
+
+# Query parameters that carry credentials, they are dropped from the recorded query string
+SECRET_QUERY_PARAMS = frozenset((
+    "access_token",
+    "api_key",
+    "apikey",
+    "auth",
+    "key",
+    "password",
+    "secret",
+    "signature",
+    "token",
+))
+
+
+class TrafficRecorder:
+    """
+    An ASGI middleware that appends a sample of the HTTP requests to a capture file, one JSON line each
+
+    A record has the request without its secret headers and query parameters, its body, the status, the size and the digest
+    of the response and the duration, `razor.server.replay` feeds the records back to an application
+
+    path           : The capture file, records are appended by a background thread,
+                     "{pid}" in it is replaced so that each worker process writes its own file
+    sample_rate    : The fraction of requests that are recorded
+    max_body_size  : Requests with a larger body are not recorded
+    secret_headers : The headers that are left out of the records
+    secret_params  : The query parameters that are left out of the records, compared case-insensitively
+
+    app.add_middleware(TrafficRecorder, path="capture.jsonl", sample_rate=0.01)
+    """
+
+    def __init__(
+        self,
+        asgi_app: AsgiApp,
+        path: str,
+        sample_rate: float = 0.01,
+        max_body_size: int = 64 * 1024,
+        secret_headers: Optional[Iterable[Union[str, bytes]]] = None,
+        secret_params: Optional[Iterable[str]] = None
+    ):
+        self.asgi_app = asgi_app
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_body_size = max_body_size
+        self.secret_headers = SECRET_HEADERS if secret_headers is None else frozenset(
+            header.lower() if isinstance(header, bytes) else header.lower().encode("latin-1")
+            for header in secret_headers
+        )
+        self.secret_params = SECRET_QUERY_PARAMS if secret_params is None else frozenset(
+            param.lower() for param in secret_params
+        )
+        self.recorded = 0
+
+        self._file: Optional[IO[str]] = None
+        self._writer: Optional[AccessLogger] = None
+
+    @property
+    def writer(self) -> AccessLogger:
+        # The access log writer thread already batches JSON lines off the event loop
+        if self._writer is None:
+            self._file = open(self.path.format(pid=os.getpid()), "a", encoding="utf-8")
+            self._writer = AccessLogger(stream=self._file)
+        return self._writer
+
+    async def __call__(self, scope: AsgiScope, receive: AsgiReceive, send: AsgiSend):
+        if scope["type"] == "lifespan":
+            try:
+                return await self.asgi_app(scope, receive, send)
+            finally:
+                # The queued records are written once the application has shut down
+                await asyncio.to_thread(self.close)
+
+        if scope["type"] != "http" or random.random() >= self.sample_rate:
+            return await self.asgi_app(scope, receive, send)
+
+        start = time.time()
+        started = time.perf_counter()
+        chunks = []
+        body_size = 0
+        status = None
+        response_size = 0
+        digest = hashlib.blake2b(digest_size=16)
+
+        async def receive_wrapper() -> AsgiMessage:
+            nonlocal body_size
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                body_size += len(chunk)
+                if body_size <= self.max_body_size:
+                    chunks.append(chunk)
+            return message
+
+        async def send_wrapper(message: AsgiMessage):
+            nonlocal status, response_size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                body = message.get("body", b"")
+                response_size += len(body)
+                digest.update(body)
+            await send(message)
+
+        try:
+            await self.asgi_app(scope, receive_wrapper, send_wrapper)
+        finally:
+            if body_size <= self.max_body_size:
+                self.record(scope, b"".join(chunks), {
+                    "ts": round(start, 6),
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                    "status": status,
+                    "response_size": response_size,
+                    "response_digest": digest.hexdigest(),
+                })
+
+    def record(self, scope: AsgiScope, body: bytes, result: Dict[str, Any]):
+        self.recorded += 1
+        self.writer.log({
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": scope.get("route"),
+            "query_string": self.strip_query_string(scope.get("query_string", b"").decode("latin-1")),
+            "headers": [
+                [key.decode("latin-1"), value.decode("latin-1")]
+                for key, value in scope["headers"]
+                if key.lower() not in self.secret_headers
+            ],
+            "body": base64.b64encode(body).decode("ascii"),
+            **result,
+        })
+
+    def strip_query_string(self, query_string: str) -> str:
+        """
+        Drops the secret parameters, the others are kept exactly as they were sent
+        """
+        return "&".join(
+            pair for pair in query_string.split("&")
+            if pair and unquote_plus(pair.partition("=")[0]).lower() not in self.secret_params
+        )
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._file.close()
+            self._writer = self._file = None
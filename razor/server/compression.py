@@ -0,0 +1,93 @@
+import zlib
+from typing import Iterator, Optional
+
+from .exceptions import (
+    RequestEntityTooLargeException,
+    RequestDecodingException,
+    UnsupportedContentEncodingException
+)
+
+
+class Decompressor:
+    """
+    Decodes a gzip or deflate request body chunk by chunk
+
+    Output is produced in blocks of at most CHUNK_SIZE bytes, so a small compressed body
+    never expands in memory past the limits before they are checked
+
+    max_size  : The maximum decompressed size in bytes
+    max_ratio : The maximum ratio of decompressed to compressed bytes, checked past MIN_RATIO_SIZE
+    """
+
+    ENCODINGS = ("gzip", "x-gzip", "deflate")
+    CHUNK_SIZE = 64 * 1024
+    # Small bodies of repeated bytes legitimately compress far better than the ratio
+    MIN_RATIO_SIZE = 1024 * 1024
+
+    def __init__(self, encoding: str, max_size: Optional[int] = None, max_ratio: Optional[float] = None):
+        if encoding not in self.ENCODINGS:
+            raise UnsupportedContentEncodingException(f"unsupported request content-encoding: {encoding!r}")
+
+        self.encoding = encoding
+        self.max_size = max_size
+        self.max_ratio = max_ratio
+        self.compressed_size = 0
+        self.size = 0
+
+        # deflate is either zlib wrapped or raw, its first two bytes tell which one
+        self._head = b""
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if encoding != "deflate" else None
+
+    def decompress(self, chunk: bytes) -> Iterator[bytes]:
+        self.compressed_size += len(chunk)
+        data = chunk
+        if self._decompressor is None:
+            self._head += chunk
+            if len(self._head) < 2:
+                return
+            data, self._head = self._head, b""
+            self._decompressor = zlib.decompressobj(zlib.MAX_WBITS if is_zlib_header(data) else -zlib.MAX_WBITS)
+
+        while data:
+            try:
+                output = self._decompressor.decompress(data, self.CHUNK_SIZE)
+            except zlib.error as exc:
+                raise RequestDecodingException(f"invalid {self.encoding} request body: {exc}") from None
+
+            data = self._decompressor.unconsumed_tail
+            if self._decompressor.eof and self._decompressor.unused_data:
+                raise RequestDecodingException(f"unexpected data after the {self.encoding} request body")
+            if output:
+                self._check(len(output))
+                yield output
+
+    def flush(self) -> bytes:
+        if not self.compressed_size:
+            return b""
+        if self._decompressor is None or not self._decompressor.eof:
+            raise RequestDecodingException(f"truncated {self.encoding} request body")
+        output = self._decompressor.flush()
+        if output:
+            self._check(len(output))
+        return output
+
+    def _check(self, size: int):
+        self.size += size
+        if self.max_size is not None and self.size > self.max_size:
+            raise RequestEntityTooLargeException(
+                f"decompressed request body exceeds the limit of {self.max_size} bytes")
+        if (
+            self.max_ratio is not None
+            and self.size > self.MIN_RATIO_SIZE
+            and self.size > self.compressed_size * self.max_ratio
+        ):
+            raise RequestEntityTooLargeException(
+                f"request body expands more than {self.max_ratio} times when decompressed")
+
+
+def is_zlib_header(data: bytes) -> bool:
+    """
+    Whether data starts with a zlib header, a deflate compression method and a check value
+    that makes the first two bytes a multiple of 31 (RFC 1950)
+    """
+    return data[0] & 0x0F == 8 and data[0] >> 4 <= 7 and (data[0] << 8 | data[1]) % 31 == 0
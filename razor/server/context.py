@@ -3,12 +3,15 @@ from typing import Any, List, Type, TYPE_CHECKING
 
 from .request import Request
 from .types import AsgiScope, AsgiReceive, AsgiSend
-from .globals import _cv_request, _cv_application
 
 if TYPE_CHECKING:
     from .application import Application
 
 
+_cv_request: contextvars.ContextVar = contextvars.ContextVar("razor.request_context")
+_cv_application: contextvars.ContextVar = contextvars.ContextVar("razor.application_context")
+
+
 class Context:
     """
     Basic context class
@@ -58,3 +61,7 @@ class RequestContext(Context):
             var=self._request
         )
 
+    @property
+    def request(self) -> Request:
+        return self._request
+
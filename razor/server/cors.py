@@ -0,0 +1,127 @@
+import functools
+from typing import Iterable, List, Optional, Tuple
+
+from .response import Response, TextResponse
+from .types import AsgiHeaders, AsgiScope, AsgiSend, AsgiMessage
+
+
+SAFELISTED_METHODS = frozenset(("GET", "HEAD", "POST"))
+
+
+class CorsPolicy:
+    """
+    The cross-origin rules of the application or of a route
+
+    Preflight responses are built once for each origin, method and requested headers and reused,
+    the other responses only get a header block that is built once for each origin
+
+    allow_origins     : The allowed origins, "*" allows any origin
+    allow_methods     : The methods allowed in a preflight, "*" allows any method
+    allow_headers     : The request headers allowed in a preflight, "*" allows any header
+    expose_headers    : The response headers the browser exposes to the page
+    allow_credentials : Whether cookies and authorization are sent, the origin is then echoed instead of "*"
+    max_age           : Seconds the browser caches a preflight
+    cache_size        : The number of prebuilt responses and header blocks kept
+
+    app.enable_cors(allow_origins=["https://example.com"], allow_credentials=True)
+    """
+
+    def __init__(
+        self,
+        allow_origins: Iterable[str] = ("*",),
+        allow_methods: Iterable[str] = ("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE"),
+        allow_headers: Iterable[str] = (),
+        expose_headers: Iterable[str] = (),
+        allow_credentials: bool = False,
+        max_age: int = 600,
+        cache_size: int = 1024
+    ):
+        self.allow_origins = frozenset(allow_origins)
+        self.allow_methods = frozenset(method.upper() for method in allow_methods)
+        self.allow_headers = frozenset(header.lower() for header in allow_headers)
+        self.expose_headers = tuple(expose_headers)
+        self.allow_credentials = allow_credentials
+        self.max_age = max_age
+
+        self.allow_any_origin = "*" in self.allow_origins
+        self.allow_any_method = "*" in self.allow_methods
+        self.allow_any_header = "*" in self.allow_headers
+
+        self.preflight_response = functools.lru_cache(maxsize=cache_size)(self.build_preflight_response)
+        self.response_headers = functools.lru_cache(maxsize=cache_size)(self.build_response_headers)
+
+    def is_origin_allowed(self, origin: str) -> bool:
+        return self.allow_any_origin or origin in self.allow_origins
+
+    def _origin_headers(self, origin: str) -> List[Tuple[str, str]]:
+        # A response that depends on the origin must not be shared by caches across origins
+        if self.allow_any_origin and not self.allow_credentials:
+            headers = [("access-control-allow-origin", "*")]
+        else:
+            headers = [("access-control-allow-origin", origin), ("vary", "origin")]
+        if self.allow_credentials:
+            headers.append(("access-control-allow-credentials", "true"))
+        return headers
+
+    def build_preflight_response(self, origin: str, method: str, request_headers: str) -> Response:
+        """
+        The response of an OPTIONS preflight, use the cached `preflight_response`
+        """
+        if not self.is_origin_allowed(origin):
+            return TextResponse("Disallowed CORS origin", status_code=400)
+        if not (self.allow_any_method or method in SAFELISTED_METHODS or method in self.allow_methods):
+            return TextResponse("Disallowed CORS method", status_code=400)
+
+        requested = [header.strip().lower() for header in request_headers.split(",") if header.strip()]
+        if not self.allow_any_header and any(header not in self.allow_headers for header in requested):
+            return TextResponse("Disallowed CORS headers", status_code=400)
+
+        allow_methods = method if self.allow_any_method else ", ".join(sorted(self.allow_methods | {method}))
+        headers = [
+            *self._origin_headers(origin),
+            ("access-control-allow-methods", allow_methods),
+            ("access-control-max-age", str(self.max_age)),
+        ]
+        if requested:
+            headers.append(("access-control-allow-headers", ", ".join(requested)))
+        return Response(b"", status_code=204, headers=headers)
+
+    def build_response_headers(self, origin: str) -> AsgiHeaders:
+        """
+        The headers added to a response for a cross-origin request, use the cached `response_headers`
+        """
+        if not self.is_origin_allowed(origin):
+            return []
+
+        headers = self._origin_headers(origin)
+        if self.expose_headers:
+            headers.append(("access-control-expose-headers", ", ".join(self.expose_headers)))
+        return [(key.encode("latin-1"), value.encode("latin-1")) for key, value in headers]
+
+
+def get_cors_headers(scope: AsgiScope) -> Tuple[Optional[str], Optional[str], str]:
+    """
+    Returns the origin, the preflight method and the preflight headers of a request
+    """
+    origin = method = None
+    request_headers = ""
+    for key, value in scope["headers"]:
+        if key == b"origin":
+            origin = value.decode("latin-1")
+        elif key == b"access-control-request-method":
+            method = value.decode("latin-1").upper()
+        elif key == b"access-control-request-headers":
+            request_headers = value.decode("latin-1")
+    return origin, method, request_headers
+
+
+def add_headers(send: AsgiSend, headers: AsgiHeaders) -> AsgiSend:
+    """
+    Adds a prebuilt header block to the response
+    """
+    async def send_wrapper(message: AsgiMessage):
+        if message["type"] == "http.response.start":
+            message = {**message, "headers": [*message.get("headers", ()), *headers]}
+        await send(message)
+
+    return send_wrapper
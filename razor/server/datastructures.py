@@ -1,21 +1,185 @@
 import os
-from typing import Optional
-from tempfile import SpooledTemporaryFile as BaseSpooledTemporaryFile
+import uuid
+import shutil
+import asyncio
+from typing import Dict, List, Optional, TYPE_CHECKING
+from tempfile import NamedTemporaryFile, SpooledTemporaryFile as BaseSpooledTemporaryFile
 
-from aiofiles import open as async_open
+if TYPE_CHECKING:
+    from multidict import MultiDict
+
+
+def _get_umask() -> int:
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# Read once at import, os.umask can only be read by setting it, which is not thread-safe
+FILE_MODE = 0o666 & ~_get_umask()
 
 
 class SpooledTemporaryFile(BaseSpooledTemporaryFile):
     """
     A temporary file to store files uploaded by the Form form
+    The data is kept in memory up to max_size bytes and rolls over to a named file on disk after that
     The save method allows you to write temporary data from memory to disk
     """
+
+    # Uploads larger than this are spooled to disk
+    MAX_SIZE = 1024 * 1024
+    # The size of the chunks copied when an upload is saved
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, max_size: int = MAX_SIZE, *args, filename: Optional[str] = None, content_type: Optional[str] = None, **kwargs):
+        """
+        filename     : The file name sent by the client
+        content_type : The content type sent by the client
+        dir          : The directory of the rolled over file, on the destination filesystem saving is a link
+        """
+        super().__init__(max_size, *args, **kwargs)
+        self.filename = filename
+        self.content_type = content_type
+
+    @property
+    def name(self) -> Optional[str]:
+        return self.filename
+
+    def rollover(self):
+        # Rolls over to a named file, so that save() can link it into place instead of copying it
+        if self._rolled:
+            return
+        file = self._file
+        newfile = self._file = NamedTemporaryFile(**self._TemporaryFileArgs)
+        del self._TemporaryFileArgs
+
+        pos = file.tell()
+        newfile.write(file.getvalue())
+        newfile.seek(pos, 0)
+
+        self._rolled = True
+
     async def save(self, destination: Optional[os.PathLike] = None):
+        """
+        Writes the upload to destination in a worker thread, so the event loop is never blocked
+        """
         destination = destination or f"./{self.name}"
         dirname = os.path.dirname(destination)
-        if not os.path.exists(dirname):
+        if dirname and not os.path.exists(dirname):
             os.makedirs(dirname, exist_ok=True)
 
-        async with async_open(destination, mode="wb") as f:
-            for line in self.readlines():
-                await f.write(line)
+        await asyncio.to_thread(self._save, os.fspath(destination))
+
+    def _save(self, destination: str):
+        self._file.flush()
+
+        if not self._rolled:
+            # The memory buffer is written at once, without copying it first
+            with open(destination, "wb") as f:
+                f.write(self._file.getbuffer())
+            return
+
+        if self._link(destination):
+            return
+
+        with open(destination, "wb") as f:
+            self._copy(f)
+
+    def _link(self, destination: str) -> bool:
+        """
+        Links the rolled over file into place through a temporary name and an atomic rename
+        Returns False if the destination is on another filesystem
+        """
+        temporary = os.path.join(os.path.dirname(destination), f".{uuid.uuid4().hex}.upload")
+        try:
+            os.link(self._file.name, temporary)
+        except OSError:
+            return False
+        try:
+            # The temporary file is private (0600), a saved file gets the mode of any other new file
+            os.chmod(temporary, FILE_MODE)
+            os.replace(temporary, destination)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        return True
+
+    def _copy(self, f):
+        """
+        Copies the rolled over file in chunks, in the kernel where sendfile is available
+        """
+        src_fd, dst_fd = self._file.fileno(), f.fileno()
+        size = os.fstat(src_fd).st_size
+
+        if hasattr(os, "sendfile"):
+            offset = 0
+            try:
+                while offset < size:
+                    sent = os.sendfile(dst_fd, src_fd, offset, min(self.CHUNK_SIZE, size - offset))
+                    if not sent:
+                        break
+                    offset += sent
+                return
+            except OSError:
+                if offset:
+                    raise
+
+        position = self._file.tell()
+        try:
+            self._file.seek(0)
+            shutil.copyfileobj(self._file, f, self.CHUNK_SIZE)
+        finally:
+            self._file.seek(position)
+
+
+def upload_filename(filename: Optional[str]) -> str:
+    """
+    The base name of the file name sent by the client, so a client cannot write outside of the directory
+    """
+    filename = os.path.basename((filename or "").replace("\\", "/").replace("\x00", ""))
+    if filename in ("", ".", ".."):
+        return uuid.uuid4().hex
+    return filename
+
+
+def reserve_paths(directory: str, filenames: List[str]) -> List[str]:
+    """
+    Creates an empty file for each name, "name-1.ext", "name-2.ext"... when the name is taken
+    Files are created exclusively, so uploads saved at the same time never share a path
+    """
+    paths = []
+    for filename in filenames:
+        stem, extension = os.path.splitext(filename)
+        index = 0
+        while True:
+            path = os.path.join(directory, filename if not index else f"{stem}-{index}{extension}")
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+            except FileExistsError:
+                index += 1
+                continue
+            paths.append(path)
+            break
+    return paths
+
+
+async def save_files(files: "MultiDict[SpooledTemporaryFile]", directory: os.PathLike) -> Dict[str, List[str]]:
+    """
+    Saves every uploaded file into directory concurrently, under the base name sent by the client
+    A number is added to the names that are already taken, existing files are never overwritten
+    Returns the saved paths grouped by form field name
+    """
+    directory = os.fspath(directory)
+    os.makedirs(directory, exist_ok=True)
+
+    uploads = list(files.items())
+    paths = await asyncio.to_thread(
+        reserve_paths, directory, [upload_filename(file.filename) for _, file in uploads]
+    )
+
+    saved: Dict[str, List[str]] = {}
+    for (field_name, _), destination in zip(uploads, paths):
+        saved.setdefault(field_name, []).append(destination)
+
+    await asyncio.gather(*(file.save(destination) for (_, file), destination in zip(uploads, paths)))
+    return saved
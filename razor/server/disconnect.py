@@ -0,0 +1,100 @@
+import asyncio
+from collections import deque
+from typing import Deque, Optional, TYPE_CHECKING
+
+from .types import AsgiScope, AsgiReceive, AsgiMessage
+
+if TYPE_CHECKING:
+    from .draining import RequestTracker
+
+
+# The values of `on_disconnect`
+DISCONNECT_MODES = ("flag", "cancel")
+
+
+class DisconnectWatcher:
+    """
+    Reads the messages of a request in a task of its own, so a `http.disconnect` is seen
+    while the handler is still running, not only when it reads the body
+
+    The body messages are handed to the request one at a time, the next one is only received
+    once the request took the previous one, so the body is not read ahead of the handler.
+    A disconnect during a body the handler does not read is only seen once the body is read.
+
+    On disconnect `scope["disconnected"]` is set, `Request.is_disconnected` reads it and streaming
+    responses stop producing. With cancel, the task running the handler is cancelled as well
+    """
+
+    def __init__(self, scope: AsgiScope, receive: AsgiReceive, cancel: bool, tracker: "RequestTracker"):
+        self.scope = scope
+        self._receive = receive
+        self.cancel = cancel
+        self.tracker = tracker
+        self.disconnected = False
+
+        self._messages: Deque[AsgiMessage] = deque()
+        self._message_ready = asyncio.Event()
+        self._message_taken = asyncio.Event()
+        self._request_task: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._request_task = asyncio.current_task()
+        self._task = asyncio.ensure_future(self._watch())
+
+    def stop(self):
+        """
+        Stops watching, a disconnect no longer cancels the request task
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _watch(self):
+        while True:
+            message = await self._receive()
+            if message["type"] == "http.disconnect":
+                self._disconnect()
+
+            self._messages.append(message)
+            self._message_taken.clear()
+            self._message_ready.set()
+            if message["type"] == "http.disconnect":
+                return
+            # The next body chunk is received once the request took this one,
+            # after the last one the server only sends the disconnect
+            if message.get("more_body", False):
+                await self._message_taken.wait()
+
+    def _disconnect(self):
+        self.disconnected = True
+        self.scope["disconnected"] = True
+        self.tracker.disconnected += 1
+        if self.cancel and self._request_task is not None:
+            self.tracker.cancelled += 1
+            self._request_task.cancel()
+
+    async def receive(self) -> AsgiMessage:
+        """
+        The `receive` of the request while it is watched
+        """
+        while not self._messages:
+            self._message_ready.clear()
+            await self._message_ready.wait()
+
+        message = self._messages.popleft()
+        # A disconnect is returned to every later call, like the server does
+        if message["type"] == "http.disconnect":
+            self._messages.append(message)
+        else:
+            self._message_taken.set()
+        return message
+
+    def uncancel(self):
+        """
+        Called once the cancellation of a disconnected request is handled, the request task goes on
+        """
+        # Task.uncancel exists from Python 3.11
+        uncancel = getattr(self._request_task, "uncancel", None)
+        if uncancel is not None:
+            uncancel()
@@ -0,0 +1,92 @@
+import time
+import asyncio
+from typing import Any, Coroutine, Dict, Set
+
+from .logs import logger
+from .response import JsonResponse
+from .types import AsgiScope, AsgiReceive, AsgiSend
+
+
+class RequestTracker:
+    """
+    Counts the requests in flight and the background tasks of the application
+    so that shutdown can wait for them, and reports the draining progress
+
+    The tracker is an ASGI callable that answers readiness probes:
+    200 while the application accepts requests, 503 once it is draining
+
+    app.add_readiness_route("/readyz")
+    """
+
+    # Seconds between two checks while waiting for the work in flight
+    DRAIN_POLL_INTERVAL = 0.05
+
+    def __init__(self):
+        self.inflight = 0
+        self.draining = False
+        # Set once new requests are rejected, draining may start earlier to only fail readiness probes
+        self.rejecting = False
+        self.draining_since = None
+        # Requests whose client went away, and the ones whose handler was cancelled for it
+        self.disconnected = 0
+        self.cancelled = 0
+        self._tasks: Set[asyncio.Task] = set()
+
+    def create_task(self, coro: Coroutine) -> asyncio.Task:
+        """
+        Starts background work that shutdown waits for
+        """
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def start_draining(self, reject: bool = True):
+        """
+        Readiness probes fail from now on, with reject new requests are answered with 503 as well
+        """
+        if not self.draining:
+            self.draining = True
+            self.draining_since = time.monotonic()
+            logger.info(f"Draining started with {self.inflight} requests and {len(self._tasks)} tasks in flight")
+        if reject:
+            self.rejecting = True
+
+    def reset(self):
+        """
+        Accepts requests again, called at startup so an application can go through several lifespans
+        """
+        self.draining = self.rejecting = False
+        self.draining_since = None
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        Waits up to timeout seconds for the requests and tasks in flight
+        Returns False if some work was still running at the deadline
+        """
+        self.start_draining()
+        deadline = asyncio.get_running_loop().time() + timeout
+        while self.inflight or self._tasks:
+            if asyncio.get_running_loop().time() >= deadline:
+                logger.warning(
+                    f"Drain timeout of {timeout}s reached with {self.inflight} requests "
+                    f"and {len(self._tasks)} tasks in flight")
+                return False
+            await asyncio.sleep(self.DRAIN_POLL_INTERVAL)
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        status = {
+            "status": "draining" if self.draining else "ready",
+            "inflight_requests": self.inflight,
+            "background_tasks": len(self._tasks),
+            "disconnected_requests": self.disconnected,
+            "cancelled_requests": self.cancelled,
+        }
+        if self.draining:
+            status["draining_seconds"] = round(time.monotonic() - self.draining_since, 3)
+        return status
+
+    async def __call__(self, scope: AsgiScope, receive: AsgiReceive, send: AsgiSend):
+        response = JsonResponse(self.status(), status_code=503 if self.draining else 200)
+        await response(scope, receive, send)
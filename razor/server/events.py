@@ -1,7 +1,15 @@
-from typing import Dict, List, Awaitable, Any
+import time
+import asyncio
+import inspect
+from typing import Dict, List, Awaitable, Any, Iterable, Optional, MutableMapping
+
+from .logs import logger
 from .response import Response
 from .exceptions import RegisterEventException
 
+# A hook that requires ALL_HOOKS starts once every other hook of its event is complete
+ALL_HOOKS = "*"
+
 
 class EventResponseHandler:
     def __call__(self, event, cb_resp):
@@ -31,11 +39,45 @@ class EventResponseHandler:
         return cb_resp
 
 
+class LifespanHook:
+    """
+    A startup or shutdown callback together with its scheduling options
+
+    name     : The name other hooks use to depend on this one, defaults to the callback name,
+               qualified with its module when another hook already has that name
+    requires : Names of hooks of the same event that must complete before this one starts,
+               or ALL_HOOKS for every hook of the event that does not itself require ALL_HOOKS
+    timeout  : Seconds the hook may run before the lifespan event fails
+    """
+    __slots__ = ("callback", "name", "requires", "timeout", "takes_state")
+
+    def __init__(self, callback, name: Optional[str] = None, requires: Iterable[str] = (), timeout: Optional[float] = None):
+        self.callback = callback
+        self.name = name or callback.__name__
+        self.requires = tuple(requires)
+        self.timeout = timeout
+        # A hook that declares a parameter receives the lifespan state shared with every request
+        self.takes_state = bool(inspect.signature(callback).parameters)
+
+    async def __call__(self, state: MutableMapping[str, Any]):
+        if self.takes_state:
+            return await self.callback(state)
+        return await self.callback()
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.name}>"
+
+
 class EventManager:
     """
     An event manager object that provides functionality such as registering events and running callbacks
     """
 
+    LIFESPAN_EVENT_TYPES = (
+        "startup",
+        "shutdown"
+    )
+
     EVENT_TYPES = (
         "startup",
         "shutdown",
@@ -51,10 +93,89 @@ class EventManager:
         }
         self._event_resp_handle = EventResponseHandler()
 
-    def register(self, event: str, callback):
+    def register(self, event: str, callback, **opts):
         if event not in self.EVENT_TYPES:
             raise RegisterEventException(f"registering an `{event}` failed, event is not exists")
-        self._events[event].append(callback)
+
+        if event in self.LIFESPAN_EVENT_TYPES:
+            hook = LifespanHook(callback, **opts)
+            names = {registered.name for registered in self._events[event]}
+            if hook.name in names:
+                if opts.get("name"):
+                    raise RegisterEventException(f"registering an `{event}` failed, hook `{hook.name}` already exists")
+                # Modules may each register an `async def startup()`, a default name is made unique
+                hook.name = f"{callback.__module__}.{callback.__qualname__}"
+                unique, count = hook.name, 1
+                while unique in names:
+                    count += 1
+                    unique = f"{hook.name}#{count}"
+                hook.name = unique
+            self._events[event].append(hook)
+        elif opts:
+            raise RegisterEventException(f"registering an `{event}` failed, options are only supported by lifespan events")
+        else:
+            self._events[event].append(callback)
+
+        return callback
+
+    def _sort_lifespan_hooks(self, event: str) -> Dict[str, LifespanHook]:
+        """
+        Checks the dependencies of the lifespan hooks and returns them in an order that can be scheduled
+        """
+        hooks = {hook.name: hook for hook in self._events[event]}
+        ordered: Dict[str, LifespanHook] = {}
+        visiting = set()
+
+        def visit(hook: LifespanHook):
+            if hook.name in ordered:
+                return
+            if hook.name in visiting:
+                raise RegisterEventException(f"event '{event}' hook `{hook.name}` has a circular dependency")
+            visiting.add(hook.name)
+            for name in self._get_requires(event, hook):
+                if name not in hooks:
+                    raise RegisterEventException(f"event '{event}' hook `{hook.name}` requires unknown hook `{name}`")
+                visit(hooks[name])
+            visiting.discard(hook.name)
+            ordered[hook.name] = hook
+
+        for hook in hooks.values():
+            visit(hook)
+        return ordered
+
+    def _get_requires(self, event: str, hook: LifespanHook) -> Iterable[str]:
+        if hook.requires != (ALL_HOOKS,):
+            return hook.requires
+        return tuple(other.name for other in self._events[event] if other.requires != (ALL_HOOKS,))
+
+    async def run_lifespan(self, event: str, state: MutableMapping[str, Any]):
+        """
+        Runs the startup or shutdown hooks concurrently
+        Each hook starts as soon as the hooks it requires are complete
+        """
+        tasks: Dict[str, asyncio.Future] = {}
+
+        async def run_hook(hook: LifespanHook):
+            requires = self._get_requires(event, hook)
+            if requires:
+                await asyncio.gather(*(tasks[name] for name in requires))
+            start = time.perf_counter()
+            try:
+                cb_r = await asyncio.wait_for(hook(state), hook.timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"event '{event}' hook `{hook.name}` timed out after {hook.timeout}s") from None
+            self._event_resp_handle(event, cb_r)
+            logger.info(f"{event} hook '{hook.name}' completed in {(time.perf_counter() - start) * 1000:.2f}ms")
+
+        for name, hook in self._sort_lifespan_hooks(event).items():
+            tasks[name] = asyncio.ensure_future(run_hook(hook))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            # If one hook fails, the hooks still running are no longer needed
+            for task in tasks.values():
+                task.cancel()
 
     async def run_callback(self, event, *args, **kwargs):
         callbacks = self._events.get(event)
@@ -65,3 +186,36 @@ class EventManager:
                 args = (cb_r, )
         if args:
             return args[0]
+
+
+class HookChain:
+    """
+    The request hooks that apply to a route, built once when the route is registered
+    The event managers are ordered from the application to the innermost group
+
+    before_request hooks run from the outside in and stop at the first response
+    after_request and exception hooks run from the inside out
+    """
+    __slots__ = ("managers", "_reversed_managers")
+
+    REVERSED_EVENT_TYPES = (
+        "after_request",
+        "exception"
+    )
+
+    def __init__(self, *managers: EventManager):
+        self.managers = managers
+        self._reversed_managers = tuple(reversed(managers))
+
+    async def run_callback(self, event, *args, **kwargs):
+        managers = self._reversed_managers if event in self.REVERSED_EVENT_TYPES else self.managers
+
+        for manager in managers:
+            cb_r = await manager.run_callback(event, *args, **kwargs)
+            if cb_r is None:
+                continue
+            if event == "before_request":
+                return cb_r
+            args = (cb_r, )
+        if args:
+            return args[0]
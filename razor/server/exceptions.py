@@ -2,6 +2,26 @@ class RegisterEventException(Exception):
     pass
 
 
+class RequestBodyException(Exception):
+    pass
+
+
+class RequestEntityTooLargeException(RequestBodyException):
+    pass
+
+
+class RequestTimeoutException(RequestBodyException):
+    pass
+
+
+class RequestDecodingException(RequestBodyException):
+    pass
+
+
+class UnsupportedContentEncodingException(RequestBodyException):
+    pass
+
+
 class RouterException(Exception):
     pass
 
@@ -12,3 +32,7 @@ class NotFoundException(RouterException):
 
 class InvalidMethodException(RouterException):
     pass
+
+
+class SharedStoreLockTimeoutException(TimeoutError):
+    pass
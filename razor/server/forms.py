@@ -121,9 +121,11 @@ class MultipartReader:
 
         if "filename" in options:
             # If the uploaded file is included, a temporary file is created to write the file data to memory
-            self.filed_data = SpooledTemporaryFile()
-            self.filed_data._file.name = options["filename"]
-            self.filed_data.content_type = self.headers[b"content-type"].decode(self.charset)
+            # large files roll over to disk
+            self.filed_data = SpooledTemporaryFile(
+                filename=options["filename"],
+                content_type=self.headers[b"content-type"].decode(self.charset)
+            )
 
     def on_part_data(self, data: bytes, start: int, end: int):
         # writes data to filed_data
@@ -221,7 +223,13 @@ async def parse_form_data(request: "Request") -> Tuple[MultiDict, MultiDict]:
 
     parser = reader.get_parser(request)
 
-    parser.write(await request.body())
+    if content_type == "multipart/form-data":
+        # The body is fed as it is received, large uploads are spooled to disk without being held in memory
+        async for chunk in request.stream():
+            parser.write(chunk)
+    else:
+        # A urlencoded body is small, it stays available to `request.body()`
+        parser.write(await request.body())
     parser.finalize()
 
     return reader.forms, reader.files
@@ -0,0 +1,317 @@
+import ssl
+import time
+import asyncio
+from collections import deque
+from http import HTTPStatus
+from urllib.parse import urlsplit
+from typing import Deque, List, Optional, Tuple, TYPE_CHECKING
+
+from .logs import logger
+from .response import Response, ErrorResponse
+from .exceptions import RequestBodyException, RequestTimeoutException
+from .types import AsgiScope, AsgiReceive, AsgiSend, AsgiHeaders
+
+if TYPE_CHECKING:
+    import h11
+    from .request import Request
+
+
+# Headers that only apply to a single connection and are never forwarded
+HOP_BY_HOP_HEADERS = frozenset((
+    b"connection",
+    b"keep-alive",
+    b"proxy-authenticate",
+    b"proxy-authorization",
+    b"te",
+    b"trailer",
+    b"trailers",
+    b"transfer-encoding",
+    b"upgrade",
+))
+
+
+class UpstreamTimeout(Exception):
+    pass
+
+
+def filter_headers(headers: AsgiHeaders) -> AsgiHeaders:
+    """
+    Removes the hop-by-hop headers, including the ones listed in the Connection header
+    """
+    hop_by_hop = HOP_BY_HOP_HEADERS
+    for key, value in headers:
+        if key.lower() == b"connection":
+            hop_by_hop = hop_by_hop | {token.strip().lower() for token in value.split(b",")}
+    return [(key, value) for key, value in headers if key.lower() not in hop_by_hop]
+
+
+class UpstreamConnection:
+    """
+    A keep-alive HTTP/1.1 connection to an upstream server
+    """
+    __slots__ = ("reader", "writer", "h11", "released_at")
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        import h11
+
+        self.reader = reader
+        self.writer = writer
+        self.h11 = h11.Connection(h11.CLIENT)
+        self.released_at = time.monotonic()
+
+    async def send(self, event: "h11.Event"):
+        data = self.h11.send(event)
+        if data:
+            self.writer.write(data)
+            await self.writer.drain()
+
+    async def next_event(self, timeout: Optional[float]) -> "h11.Event":
+        import h11
+
+        while True:
+            event = self.h11.next_event()
+            if event is not h11.NEED_DATA:
+                return event
+            try:
+                data = await asyncio.wait_for(self.reader.read(UpstreamPool.READ_SIZE), timeout)
+            except asyncio.TimeoutError:
+                raise UpstreamTimeout("timed out reading from the upstream") from None
+            self.h11.receive_data(data)
+
+    @property
+    def reusable(self) -> bool:
+        import h11
+        return self.h11.our_state is h11.DONE and self.h11.their_state is h11.DONE
+
+    def close(self):
+        self.writer.close()
+
+
+class UpstreamPool:
+    """
+    A bounded pool of keep-alive connections to one upstream server
+
+    max_connections : The maximum number of open connections, further requests wait for a free one
+    connect_timeout : Seconds to open a connection
+    read_timeout    : Seconds to wait for each read from the upstream
+    idle_timeout    : Seconds an idle connection is kept
+    """
+
+    READ_SIZE = 64 * 1024
+
+    def __init__(
+        self,
+        upstream: str,
+        max_connections: int = 10,
+        connect_timeout: float = 5,
+        read_timeout: Optional[float] = 30,
+        idle_timeout: float = 60
+    ):
+        url = urlsplit(upstream)
+        if url.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported upstream scheme: {url.scheme!r}")
+
+        self.upstream = upstream
+        self.scheme = url.scheme
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == "https" else 80)
+        self.host_header = url.netloc.rsplit("@", 1)[-1].encode("latin-1")
+        self.base_path = url.path.rstrip("/")
+
+        self.max_connections = max_connections
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.idle_timeout = idle_timeout
+
+        self._idle: Deque[UpstreamConnection] = deque()
+        self._semaphore = asyncio.Semaphore(max_connections)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.upstream}>"
+
+    async def acquire(self) -> Tuple[UpstreamConnection, bool]:
+        """
+        Returns a connection and whether it was reused from the pool
+        """
+        await self._semaphore.acquire()
+        try:
+            while self._idle:
+                connection = self._idle.pop()
+                if connection.reader.at_eof() or time.monotonic() - connection.released_at > self.idle_timeout:
+                    connection.close()
+                    continue
+                return connection, True
+            return await self._connect(), False
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    async def _connect(self) -> UpstreamConnection:
+        ssl_context = ssl.create_default_context() if self.scheme == "https" else None
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port, ssl=ssl_context, limit=self.READ_SIZE),
+                self.connect_timeout
+            )
+        except asyncio.TimeoutError:
+            raise UpstreamTimeout(f"timed out connecting to {self.upstream}") from None
+        return UpstreamConnection(reader, writer)
+
+    def release(self, connection: UpstreamConnection):
+        """
+        Returns a connection to the pool if its exchange completed, otherwise closes it
+        """
+        try:
+            if connection.reusable:
+                connection.h11.start_next_cycle()
+                connection.released_at = time.monotonic()
+                self._idle.append(connection)
+            else:
+                connection.close()
+        finally:
+            self._semaphore.release()
+
+    def discard(self, connection: UpstreamConnection):
+        connection.close()
+        self._semaphore.release()
+
+    async def close(self):
+        while self._idle:
+            self._idle.pop().close()
+
+
+class ProxyResponse(Response):
+    """
+    Streams the request to an upstream server and streams its response back, bodies are never buffered
+
+    @app.route("/api/{path:path}", methods=["GET", "POST"])
+    async def api(path, request: Request):
+        return ProxyResponse(pool, request, path=f"/{path}")
+    """
+
+    def __init__(self, pool: UpstreamPool, request: "Request", path: Optional[str] = None, **kwargs):
+        """
+        path : The path on the upstream, after its base path, defaults to the path of the request
+        """
+        self.pool = pool
+        self.request = request
+        self.path = path if path is not None else request.scope["path"]
+        super().__init__(b"", **kwargs)
+
+    def get_upstream_target(self) -> bytes:
+        target = (self.pool.base_path + self.path) or "/"
+        query_string = self.request.scope.get("query_string", b"")
+        target = target.encode("latin-1")
+        return target + b"?" + query_string if query_string else target
+
+    def get_upstream_headers(self, has_body: bool) -> List[Tuple[bytes, bytes]]:
+        scope = self.request.scope
+        headers = [(key, value) for key, value in filter_headers(scope["headers"]) if key.lower() != b"host"]
+        headers.append((b"host", self.pool.host_header))
+
+        # The original body framing is hop-by-hop, a body without a length is sent chunked
+        if has_body and not any(key.lower() == b"content-length" for key, _ in headers):
+            headers.append((b"transfer-encoding", b"chunked"))
+
+        forwarded_for = [value for key, value in headers if key.lower() == b"x-forwarded-for"]
+        client = scope.get("client")
+        if client:
+            forwarded_for.append(client[0].encode("latin-1"))
+        headers = [(key, value) for key, value in headers if key.lower() != b"x-forwarded-for"]
+        if forwarded_for:
+            headers.append((b"x-forwarded-for", b", ".join(forwarded_for)))
+        headers.append((b"x-forwarded-proto", scope.get("scheme", "http").encode("latin-1")))
+        for key, value in scope["headers"]:
+            if key.lower() == b"host":
+                headers.append((b"x-forwarded-host", value))
+                break
+        return headers
+
+    def has_body(self) -> bool:
+        for key, value in self.request.scope["headers"]:
+            key = key.lower()
+            if key == b"content-length":
+                return value.strip() != b"0"
+            if key == b"transfer-encoding":
+                return True
+        return False
+
+    async def __call__(self, scope: AsgiScope, receive: AsgiReceive, send: AsgiSend) -> None:
+        import h11
+
+        has_body = self.has_body()
+        # Requests without a body can be retried once when a pooled connection was closed by the upstream
+        attempts = 1 if has_body else 2
+        response_started = False
+
+        for attempt in range(attempts):
+            try:
+                connection, reused = await self.pool.acquire()
+            except (OSError, UpstreamTimeout) as exc:
+                logger.error(f"Cannot connect to upstream {self.pool.upstream}: {exc}")
+                return await self._send_error(exc, scope, receive, send)
+
+            try:
+                await connection.send(h11.Request(
+                    method=self.request.scope["method"],
+                    target=self.get_upstream_target(),
+                    headers=self.get_upstream_headers(has_body),
+                ))
+                if has_body:
+                    # The body is forwarded as it was sent, with its content-encoding
+                    async for chunk in self.request.stream(decode=False):
+                        await connection.send(h11.Data(data=chunk))
+                await connection.send(h11.EndOfMessage())
+
+                event = await connection.next_event(self.pool.read_timeout)
+                while isinstance(event, h11.InformationalResponse):
+                    event = await connection.next_event(self.pool.read_timeout)
+                if not isinstance(event, h11.Response):
+                    raise h11.RemoteProtocolError("upstream closed the connection without a response")
+
+                response_started = True
+                await send({
+                    "type": "http.response.start",
+                    "status": event.status_code,
+                    "headers": [*filter_headers(event.headers), *self.get_raw_headers()],
+                })
+
+                while True:
+                    event = await connection.next_event(self.pool.read_timeout)
+                    if isinstance(event, h11.Data):
+                        await send({"type": "http.response.body", "body": bytes(event.data), "more_body": True})
+                    elif isinstance(event, h11.EndOfMessage):
+                        break
+                    else:
+                        raise h11.RemoteProtocolError("upstream closed the connection during the response")
+
+                await send({"type": "http.response.body", "body": b""})
+                self.pool.release(connection)
+                return
+            except (OSError, h11.ProtocolError, UpstreamTimeout) as exc:
+                self.pool.discard(connection)
+                if response_started:
+                    logger.error(f"Upstream {self.pool.upstream} failed during the response: {exc}")
+                    raise
+                if reused and attempt + 1 < attempts:
+                    continue
+                logger.error(f"Upstream {self.pool.upstream} failed: {exc}")
+                return await self._send_error(exc, scope, receive, send)
+            except RequestBodyException as exc:
+                # The client body broke a limit while it was streamed to the upstream
+                self.pool.discard(connection)
+                return await self._send_error(exc, scope, receive, send)
+            except BaseException:
+                self.pool.discard(connection)
+                raise
+
+    async def _send_error(self, exc: Exception, scope: AsgiScope, receive: AsgiReceive, send: AsgiSend):
+        if isinstance(exc, UpstreamTimeout):
+            status = HTTPStatus.GATEWAY_TIMEOUT
+        elif isinstance(exc, RequestTimeoutException):
+            status = HTTPStatus.REQUEST_TIMEOUT
+        elif isinstance(exc, RequestBodyException):
+            status = HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+        else:
+            status = HTTPStatus.BAD_GATEWAY
+        await ErrorResponse(status)(scope, receive, send)
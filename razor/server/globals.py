@@ -1,12 +1,12 @@
-from contextvars import ContextVar
+from typing import TYPE_CHECKING
 
 from .proxy import LocalProxy
 from .request import Request
-from .application import Application
+from .context import _cv_request, _cv_application
 
+if TYPE_CHECKING:
+    from .application import Application
 
-_cv_request: ContextVar = ContextVar("razor.request_context")
-_cv_application: ContextVar = ContextVar("razor.application_context")
 
 request: Request = LocalProxy(_cv_request, Request)
-current_application: Application = LocalProxy(_cv_application, Application)
+current_application: "Application" = LocalProxy(_cv_application, "razor.server.application.Application")
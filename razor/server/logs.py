@@ -1,9 +1,20 @@
 from logging import Logger, getLogger
-from typing import Final
+from typing import Any, Final
 
-from uvicorn.config import LOGGING_CONFIG
-
-LOGGING_CONFIG["loggers"]["uvicorn.access"]["level"] = "INFO"
-LOGGING_CONFIG["loggers"]["uvicorn.error"]["level"] = "WARNING"
 
 logger: Final[Logger] = getLogger("uvicorn")
+
+
+def __getattr__(name: str) -> Any:
+    """
+    LOGGING_CONFIG is only needed by `Application.run`, so uvicorn is imported on first access
+    """
+    if name == "LOGGING_CONFIG":
+        from uvicorn.config import LOGGING_CONFIG
+
+        LOGGING_CONFIG["loggers"]["uvicorn.access"]["level"] = "INFO"
+        LOGGING_CONFIG["loggers"]["uvicorn.error"]["level"] = "WARNING"
+
+        globals()["LOGGING_CONFIG"] = LOGGING_CONFIG
+        return LOGGING_CONFIG
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
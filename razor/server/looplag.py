@@ -0,0 +1,154 @@
+import sys
+import time
+import asyncio
+import threading
+import traceback
+from collections import deque
+from types import FrameType
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .logs import logger
+from .asgi import AsgiHttpHandle
+from .response import JsonResponse
+from .types import AsgiScope, AsgiReceive, AsgiSend
+
+
+class LoopMonitor:
+    """
+    Measures the lag of the event loop and finds the handlers that block it
+
+    A heartbeat task sleeps for interval and records how late it wakes up into a histogram.
+    A watchdog thread notices when the heartbeat is more than threshold late, captures the stack
+    of the event loop thread while it is still blocked and attributes the stall to the route being handled
+
+    interval   : Seconds between two heartbeats
+    threshold  : Seconds of lag that count as a stall
+    max_stalls : The number of recent stalls kept with their stack
+
+    app.enable_loop_monitor("/_debug/loop", threshold=0.1)
+    """
+
+    # Upper bounds of the lag histogram in milliseconds, the last bucket takes the rest
+    BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self, interval: float = 0.05, threshold: float = 0.1, max_stalls: int = 100):
+        self.interval = interval
+        self.threshold = threshold
+
+        self.beats = 0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.histogram: List[int] = [0] * (len(self.BUCKETS) + 1)
+        self.stalls: Deque[Dict[str, Any]] = deque(maxlen=max_stalls)
+        self.route_stalls: Dict[str, int] = {}
+
+        self._loop_thread_id: Optional[int] = None
+        self._beat_at = 0.0
+        # The heartbeat whose stall was captured, a stall is captured once
+        self._captured_beat = -1
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        self._loop_thread_id = threading.get_ident()
+        self._beat_at = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="razor-loop-monitor", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+
+    async def _heartbeat(self):
+        while True:
+            start = time.monotonic()
+            self._beat_at = start
+            await asyncio.sleep(self.interval)
+            self.record(max(time.monotonic() - start - self.interval, 0.0))
+
+    def record(self, lag: float):
+        if self._captured_beat == self.beats and self.stalls:
+            # The stall that was captured while the loop was blocked now knows its full duration
+            self.stalls[-1]["lag_ms"] = round(lag * 1000, 3)
+
+        self.beats += 1
+        self.total_lag += lag
+        self.max_lag = max(self.max_lag, lag)
+
+        lag_ms = lag * 1000
+        for index, bound in enumerate(self.BUCKETS):
+            if lag_ms <= bound:
+                break
+        else:
+            index = len(self.BUCKETS)
+        self.histogram[index] += 1
+
+    def _watch(self):
+        while not self._stopped.wait(self.threshold / 2):
+            lag = time.monotonic() - self._beat_at - self.interval
+            beat = self.beats
+            if lag >= self.threshold and self._captured_beat != beat:
+                self._captured_beat = beat
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    self._capture(frame, lag)
+
+    def _capture(self, frame: FrameType, lag: float):
+        route = self.find_route(frame) or "<unknown>"
+        stack = traceback.format_stack(frame)
+        self.route_stalls[route] = self.route_stalls.get(route, 0) + 1
+        self.stalls.append({
+            "ts": round(time.time(), 3),
+            "route": route,
+            # Updated with the full duration once the loop runs again
+            "lag_ms": round(lag * 1000, 3),
+            "stack": stack,
+        })
+        logger.warning(f"The event loop is blocked for {lag * 1000:.0f}ms by route {route}\n{''.join(stack)}")
+
+    @staticmethod
+    def find_route(frame: Optional[FrameType]) -> Optional[str]:
+        """
+        Returns the route template of the request whose handler is running in the blocked stack
+        """
+        handle_code = AsgiHttpHandle._handle.__code__
+        while frame is not None:
+            if frame.f_code is handle_code:
+                scope = frame.f_locals.get("scope") or {}
+                return scope.get("route") or scope.get("path")
+            frame = frame.f_back
+        return None
+
+    def metrics(self) -> Dict[str, Any]:
+        buckets: List[Tuple[str, int]] = []
+        count = 0
+        # Cumulative like a Prometheus histogram
+        for bound, value in zip((*self.BUCKETS, "+Inf"), self.histogram):
+            count += value
+            buckets.append((str(bound), count))
+
+        return {
+            "beats": self.beats,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "mean_lag_ms": round(self.total_lag / self.beats * 1000, 3) if self.beats else 0.0,
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "histogram_ms": dict(buckets),
+            "route_stalls": dict(sorted(self.route_stalls.items(), key=lambda item: item[1], reverse=True)),
+            "stalls": list(self.stalls),
+        }
+
+    async def __call__(self, scope: AsgiScope, receive: AsgiReceive, send: AsgiSend):
+        await JsonResponse(self.metrics())(scope, receive, send)
@@ -0,0 +1,223 @@
+import os
+import time
+import random
+import asyncio
+import tracemalloc
+from typing import Any, Dict, List, Optional, Tuple
+
+from .response import JsonResponse
+from .types import AsgiApp, AsgiScope, AsgiReceive, AsgiSend
+
+
+def _framework_files() -> Dict[str, str]:
+    """
+    The framework modules whose allocations are reported on their own, by file name
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    files = {
+        "request.py": "request",
+        "response.py": "response",
+        "datastructures.py": "spooled_files",
+        "forms.py": "spooled_files",
+    }
+    return {os.path.join(directory, name): kind for name, kind in files.items()}
+
+
+class MemoryProfiler:
+    """
+    Records how much traced memory a sample of requests leaves allocated, grouped by route template,
+    and the allocation sites whose memory grows between periodic snapshots
+
+    A sampled request only reads the traced memory size before and after it runs, which is cheap,
+    the difference is added to its route. Concurrent requests share the heap, so a single sample is noisy,
+    the totals over many samples are not.
+    Snapshots walk the whole heap, they are taken every snapshot_interval seconds in a thread,
+    one at a time, and the growth of each allocation site since the previous snapshot is added to the
+    sites and to the framework modules. Only the largest routes and sites are kept.
+
+    sample_rate       : The fraction of requests that are measured
+    snapshot_interval : Seconds between two heap snapshots
+    frames            : The number of frames stored by tracemalloc for each allocation
+    max_routes        : The number of routes kept
+    max_sites         : The number of allocation sites kept
+
+    app.enable_memory_profiling("/_debug/memory", sample_rate=0.01, snapshot_interval=60)
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = 0.01,
+        snapshot_interval: float = 60,
+        frames: int = 10,
+        max_routes: int = 100,
+        max_sites: int = 50
+    ):
+        self.sample_rate = sample_rate
+        self.snapshot_interval = snapshot_interval
+        self.frames = frames
+        self.max_routes = max_routes
+        self.max_sites = max_sites
+
+        self.samples = 0
+        self.snapshots = 0
+        self.last_snapshot_seconds: Optional[float] = None
+        # route -> [samples, allocated bytes, largest sample]
+        self.routes: Dict[str, List[int]] = {}
+        # traceback -> [allocated bytes, allocated blocks]
+        self.sites: Dict[Tuple[str, ...], List[int]] = {}
+        self.framework: Dict[str, int] = {}
+
+        self._framework_files = _framework_files()
+        self._started = False
+        self._task: Optional[asyncio.Task] = None
+        # The size and count of each allocation site in the previous snapshot
+        self._previous: Optional[Dict[Tuple[str, ...], Tuple[int, int, str]]] = None
+        # Allocations made by these files are left out, filter_traces walks every block, this is cheaper
+        self._ignored_files = {
+            tracemalloc.__file__,
+            "<frozen importlib._bootstrap>",
+            "<frozen importlib._bootstrap_external>",
+        }
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started = True
+        self._task = asyncio.get_running_loop().create_task(self._take_snapshots())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Tracing started by someone else is left running
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+        self._previous = None
+
+    async def _take_snapshots(self):
+        while True:
+            # A single task awaits each snapshot, so there is never more than one in flight
+            growth = await asyncio.to_thread(self.snapshot)
+            # The tables are only changed on the event loop, where they are read
+            self.record_growth(growth)
+            await asyncio.sleep(self.snapshot_interval)
+
+    def snapshot(self) -> List[Tuple[Tuple[str, ...], int, int, str]]:
+        """
+        Takes a heap snapshot and returns the allocation sites that grew since the previous one,
+        it walks every traced block and runs in a thread, off the event loop
+        """
+        if not tracemalloc.is_tracing():
+            return []
+        started = time.perf_counter()
+        # Copying the traces holds the GIL, grouping them by site does not block the event loop for long
+        snapshot = tracemalloc.take_snapshot()
+        current = {}
+        for stat in snapshot.statistics("traceback"):
+            # Tracebacks go from the oldest frame to the one that allocated
+            filename = stat.traceback[-1].filename
+            if filename in self._ignored_files:
+                continue
+            site = tuple(f"{frame.filename}:{frame.lineno}" for frame in stat.traceback)
+            current[site] = (stat.size, stat.count, filename)
+        del snapshot
+
+        previous, self._previous = self._previous, current
+        growth = []
+        if previous is not None:
+            for site, (size, count, filename) in current.items():
+                previous_size, previous_count, _ = previous.get(site, (0, 0, None))
+                if size > previous_size:
+                    growth.append((site, size - previous_size, max(count - previous_count, 0), filename))
+
+        self.snapshots += 1
+        self.last_snapshot_seconds = round(time.perf_counter() - started, 3)
+        return growth
+
+    def record_growth(self, growth: List[Tuple[Tuple[str, ...], int, int, str]]):
+        for site, size_diff, count_diff, filename in growth:
+            totals = self.sites.setdefault(site, [0, 0])
+            totals[0] += size_diff
+            totals[1] += count_diff
+
+            kind = self._framework_kind(filename)
+            if kind is not None:
+                self.framework[kind] = self.framework.get(kind, 0) + size_diff
+
+        if len(self.sites) > self.max_sites * 2:
+            self.sites = dict(self._largest(self.sites, self.max_sites))
+
+    async def handle(self, asgi_app: AsgiApp, scope: AsgiScope, receive: AsgiReceive, send: AsgiSend):
+        if not tracemalloc.is_tracing() or random.random() >= self.sample_rate:
+            return await asgi_app(scope, receive, send)
+
+        before, _ = tracemalloc.get_traced_memory()
+        try:
+            await asgi_app(scope, receive, send)
+        finally:
+            after, _ = tracemalloc.get_traced_memory()
+            self.record(scope.get("route") or "<unmatched>", max(after - before, 0))
+
+    def record(self, route: str, allocated: int):
+        self.samples += 1
+        totals = self.routes.setdefault(route, [0, 0, 0])
+        totals[0] += 1
+        totals[1] += allocated
+        totals[2] = max(totals[2], allocated)
+
+        # Trimming only once the table is twice the limit keeps it off most requests
+        if len(self.routes) > self.max_routes * 2:
+            self.routes = dict(self._largest(self.routes, self.max_routes, index=1))
+
+    def _framework_kind(self, filename: str) -> Optional[str]:
+        kind = self._framework_files.get(filename)
+        if kind is None and f"{os.sep}multidict{os.sep}" in filename:
+            kind = "multidict"
+        return kind
+
+    @staticmethod
+    def _largest(table: Dict[Any, List[int]], limit: int, index: int = 0) -> List[Tuple[Any, List[int]]]:
+        return sorted(table.items(), key=lambda item: item[1][index], reverse=True)[:limit]
+
+    def reset(self):
+        self.samples = 0
+        self.routes.clear()
+        self.sites.clear()
+        self.framework.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": tracemalloc.is_tracing(),
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "samples": self.samples,
+            "snapshots": self.snapshots,
+            "last_snapshot_seconds": self.last_snapshot_seconds,
+            "routes": [
+                {
+                    "route": route,
+                    "samples": samples,
+                    "allocated_bytes": allocated,
+                    "average_bytes": allocated // samples,
+                    "max_bytes": largest,
+                }
+                for route, (samples, allocated, largest) in self._largest(self.routes, self.max_routes, index=1)
+            ],
+            "sites": [
+                {"traceback": list(site), "allocated_bytes": size, "blocks": count}
+                for site, (size, count) in self._largest(self.sites, self.max_sites)
+            ],
+            "framework": self.framework,
+        }
+
+    async def __call__(self, scope: AsgiScope, receive: AsgiReceive, send: AsgiSend):
+        # A POST clears the tables, so a window of traffic can be measured on its own
+        if scope["method"] == "POST":
+            self.reset()
+        await JsonResponse(self.stats())(scope, receive, send)
@@ -1,34 +1,28 @@
-import operator
-from functools import partial
 from contextvars import ContextVar
 
 
-class _ProxyLookup:
-    def __init__(self, f):
-        def bind_f(instance: "LocalProxy", obj):
-            return partial(f, obj)
-        self.bind_f = bind_f
-
-    def __get__(self, instance: "LocalProxy", owner: type | None = None):
-        obj = instance._get_current_object()
-        return self.bind_f(instance, obj)
-
-    def __call__(self, instance: "LocalProxy", *args, **kwargs):
-        return self.__get__(instance, type(instance))(*args, **kwargs)
-
-
 class LocalProxy:
+    """
+    Forwards attribute and item access to the object stored in a context variable
+    `ContextVar.get` is bound once, so each access costs one call and one getattr
+    """
+    __slots__ = ("local", "proxy", "_get_current_object")
+
     def __init__(self, local, proxy):
+        if not isinstance(local, ContextVar):
+            raise RuntimeError(f"Unsupported local type:{type(local)}")
         self.local = local
         self.proxy = proxy
-
-    def _get_current_object(self):
-        if isinstance(self.local, ContextVar):
-            return self.local.get()
-        raise RuntimeError(f"Unsupported local type:{type(self.local)}")
+        self._get_current_object = local.get
 
     def __repr__(self) -> str:
+        # The proxied class may be given by name to avoid importing it
+        if isinstance(self.proxy, str):
+            return f"<{self.__class__.__name__} {self.proxy}>"
         return f"<{self.__class__.__name__} {self.proxy.__module__}.{self.proxy.__name__}>"
 
-    __getattr__ = _ProxyLookup(getattr)
-    __getitem__ = _ProxyLookup(operator.__getitem__)
+    def __getattr__(self, name):
+        return getattr(self._get_current_object(), name)
+
+    def __getitem__(self, key):
+        return self._get_current_object()[key]
@@ -0,0 +1,235 @@
+"""
+Replays a capture file of `razor.server.capture.TrafficRecorder` against an application, without a network
+
+python -m razor.server.replay capture.jsonl myapp:app
+python -m razor.server.replay capture.jsonl myapp:app --compare myapp_next:app --speed recorded
+"""
+import sys
+import json
+import time
+import base64
+import asyncio
+import hashlib
+import argparse
+import importlib
+from typing import Any, Dict, Iterator, List, Optional
+
+from .types import AsgiApp, AsgiMessage
+
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class ReplayResult:
+    __slots__ = ("record", "status", "response_size", "response_digest", "duration_ms")
+
+    def __init__(self, record: Dict[str, Any], status: Optional[int], response_size: int,
+                 response_digest: str, duration_ms: float):
+        self.record = record
+        self.status = status
+        self.response_size = response_size
+        self.response_digest = response_digest
+        self.duration_ms = duration_ms
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"status": self.status, "response_size": self.response_size, "response_digest": self.response_digest}
+
+
+class Replayer:
+    """
+    Feeds recorded requests to `Application.__call__`, after running its lifespan startup
+
+    speed       : "max" sends the next request as soon as possible, "recorded" keeps the recorded gaps,
+                  a number replays that many times faster than recorded
+    concurrency : The number of requests in flight at maximum speed
+    """
+
+    def __init__(self, asgi_app: AsgiApp, speed: Any = "max", concurrency: int = 1):
+        self.asgi_app = asgi_app
+        self.speed = speed
+        self.concurrency = concurrency
+        self.state: Dict[str, Any] = {}
+
+    async def run(self, records: List[Dict[str, Any]]) -> List[ReplayResult]:
+        lifespan = await self._start_lifespan()
+        try:
+            if self.speed == "max":
+                semaphore = asyncio.Semaphore(self.concurrency)
+
+                async def limited(record):
+                    async with semaphore:
+                        return await self.send(record)
+
+                return list(await asyncio.gather(*(limited(record) for record in records)))
+
+            # The records are written when the requests finish, they are sent in the order they started
+            records = sorted(records, key=lambda record: record["ts"])
+            factor = 1.0 if self.speed == "recorded" else float(self.speed)
+            loop = asyncio.get_running_loop()
+            start, first_ts = loop.time(), records[0]["ts"] if records else 0
+            tasks = []
+            for record in records:
+                delay = start + (record["ts"] - first_ts) / factor - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.ensure_future(self.send(record)))
+            return list(await asyncio.gather(*tasks))
+        finally:
+            await self._stop_lifespan(*lifespan)
+
+    async def _start_lifespan(self):
+        messages: "asyncio.Queue[AsgiMessage]" = asyncio.Queue()
+        replies: "asyncio.Queue[AsgiMessage]" = asyncio.Queue()
+        await messages.put({"type": "lifespan.startup"})
+        task = asyncio.ensure_future(self.asgi_app(
+            {"type": "lifespan", "asgi": {"version": "3.0"}, "state": self.state}, messages.get, replies.put
+        ))
+        reply = await replies.get()
+        if reply["type"] != "lifespan.startup.complete":
+            raise RuntimeError(f"The application failed to start: {reply.get('message')}")
+        return task, messages, replies
+
+    async def _stop_lifespan(self, task: asyncio.Future, messages: asyncio.Queue, replies: asyncio.Queue):
+        await messages.put({"type": "lifespan.shutdown"})
+        await replies.get()
+        await task
+
+    async def send(self, record: Dict[str, Any]) -> ReplayResult:
+        body = base64.b64decode(record.get("body", ""))
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+        status = None
+        size = 0
+        digest = hashlib.blake2b(digest_size=16)
+
+        async def receive() -> AsgiMessage:
+            if messages:
+                return messages.pop()
+            # The replayed client never goes away
+            await asyncio.Future()
+
+        async def send(message: AsgiMessage):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                digest.update(chunk)
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "scheme": "http",
+            "method": record["method"],
+            "path": record["path"],
+            "raw_path": record["path"].encode("utf-8"),
+            "root_path": "",
+            "query_string": record.get("query_string", "").encode("latin-1"),
+            "headers": [(key.encode("latin-1"), value.encode("latin-1")) for key, value in record["headers"]],
+            "client": ("127.0.0.1", 0),
+            "server": ("127.0.0.1", 80),
+            "state": dict(self.state),
+        }
+
+        started = time.perf_counter()
+        await self.asgi_app(scope, receive, send)
+        duration_ms = (time.perf_counter() - started) * 1000
+        return ReplayResult(record, status, size, digest.hexdigest(), duration_ms)
+
+
+def latency_report(results: List[ReplayResult]) -> Dict[str, Dict[str, Any]]:
+    """
+    The latency distribution and the statuses of each route
+    """
+    routes: Dict[str, List[ReplayResult]] = {}
+    for result in results:
+        routes.setdefault(result.record.get("route") or result.record["path"], []).append(result)
+
+    report = {}
+    for route, route_results in sorted(routes.items()):
+        durations = sorted(result.duration_ms for result in route_results)
+        statuses: Dict[str, int] = {}
+        for result in route_results:
+            statuses[str(result.status)] = statuses.get(str(result.status), 0) + 1
+        report[route] = {
+            "requests": len(durations),
+            "p50_ms": round(percentile(durations, 0.5), 3),
+            "p90_ms": round(percentile(durations, 0.9), 3),
+            "p99_ms": round(percentile(durations, 0.99), 3),
+            "max_ms": round(durations[-1], 3),
+            "statuses": statuses,
+        }
+    return report
+
+
+def diff_report(baseline: List[ReplayResult], candidate: List[ReplayResult], limit: int = 20) -> Dict[str, Any]:
+    """
+    Compares the responses of two applications to the same records
+    """
+    differences = []
+    count = 0
+    for first, second in zip(baseline, candidate):
+        if first.status != second.status or first.response_digest != second.response_digest:
+            count += 1
+            if len(differences) < limit:
+                differences.append({
+                    "method": first.record["method"],
+                    "path": first.record["path"],
+                    "baseline": first.as_dict(),
+                    "candidate": second.as_dict(),
+                })
+    return {"compared": len(baseline), "different": count, "examples": differences}
+
+
+def load_app(target: str) -> AsgiApp:
+    module, _, attribute = target.partition(":")
+    return getattr(importlib.import_module(module), attribute or "app")
+
+
+async def replay(records: List[Dict[str, Any]], asgi_app: AsgiApp, compare: Optional[AsgiApp] = None,
+                 speed: Any = "max", concurrency: int = 1) -> Dict[str, Any]:
+    """
+    Replays the records against asgi_app, and against compare to diff the responses of two versions
+    """
+    results = await Replayer(asgi_app, speed, concurrency).run(records)
+    report: Dict[str, Any] = {"requests": len(results), "routes": latency_report(results)}
+    if compare is not None:
+        candidate = await Replayer(compare, speed, concurrency).run(records)
+        report["compare_routes"] = latency_report(candidate)
+        report["diff"] = diff_report(results, candidate)
+    return report
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Replay captured traffic against a Razor application")
+    parser.add_argument("capture", help="The capture file written by TrafficRecorder")
+    parser.add_argument("app", help="The application, as module:attribute")
+    parser.add_argument("--compare", help="A second application whose responses are compared")
+    parser.add_argument("--speed", default="max", help='"max", "recorded" or a speed-up factor')
+    parser.add_argument("--concurrency", type=int, default=1, help="Requests in flight at maximum speed")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, "")
+    records = list(read_records(args.capture))
+    report = asyncio.run(replay(
+        records,
+        load_app(args.app),
+        load_app(args.compare) if args.compare else None,
+        args.speed,
+        args.concurrency,
+    ))
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
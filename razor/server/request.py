@@ -1,13 +1,17 @@
 import json
-from http.cookies import _unquote
-from typing import Any, Union, Optional
+import asyncio
+import inspect
+from typing import Any, AsyncIterator, Callable, Dict, List, Union, Optional, TYPE_CHECKING
 
 from multidict import MultiDict
 
 from .constants import DEFAULT_CODING, DEFAULT_CHARSET
-from .forms import parse_form_data, SpooledTemporaryFile
+from .exceptions import RequestEntityTooLargeException, RequestTimeoutException
 from .types import AsgiScope, AsgiReceive, AsgiSend, AsgiMessage, JsonMapping
 
+if TYPE_CHECKING:
+    from .datastructures import SpooledTemporaryFile
+
 
 class Request:
 
@@ -20,10 +24,18 @@ class Request:
         "_query",
         "_content",
         "_body",
+        "_raw_body",
         "_text",
         "_forms",
         "_files",
-        "_json"
+        "_json",
+        "_msgpack",
+        "_consumed",
+        "max_body_size",
+        "body_idle_timeout",
+        "body_timeout",
+        "max_decompressed_size",
+        "max_compression_ratio"
     )
 
     def __init__(self, scope: AsgiScope, receive: AsgiReceive, send: AsgiSend):
@@ -36,10 +48,21 @@ class Request:
         self._cookies: Optional[MultiDict[str]] = None
         self._query: Optional[MultiDict[str]] = None
         self._body: Optional[bytes] = None
+        # The body as it was sent, only kept when it was decompressed
+        self._raw_body: Optional[bytes] = None
         self._text: Optional[str] = None
         self._json: Optional[JsonMapping] = None
+        self._msgpack: Optional[Any] = None
         self._forms: Optional[MultiDict[str]] = None
-        self._files: Optional[MultiDict[SpooledTemporaryFile]] = None
+        self._files: Optional[MultiDict["SpooledTemporaryFile"]] = None
+        self._consumed = False
+
+        # Limits applied while the body is read, they are set by the application for each route
+        self.max_body_size: Optional[int] = None
+        self.body_idle_timeout: Optional[float] = None
+        self.body_timeout: Optional[float] = None
+        self.max_decompressed_size: Optional[int] = None
+        self.max_compression_ratio: Optional[float] = None
 
     def __getitem__(self, key: str) -> Any:
         return self.scope[key]
@@ -73,6 +96,8 @@ class Request:
     def cookies(self) -> MultiDict:
         """Cache lazy parses data in cookies"""
         if not self._cookies:
+            from http.cookies import _unquote
+
             self._cookies = MultiDict()
             for chunk in self.headers.get("cookie").split(";"):
                 key, _, val = chunk.partition("=")
@@ -91,15 +116,148 @@ class Request:
                     self._query.add(key.strip(), val.strip())
         return self._query
 
-    async def body(self) -> bytes:
-        """Cache lazy parsing request body"""
-        if not self._body:
-            self._body: bytes = b""
+    @property
+    def is_disconnected(self) -> bool:
+        """Whether the client went away, it is only detected for routes with `on_disconnect`"""
+        return self.scope.get("disconnected", False)
+
+    @property
+    def content_length(self) -> Optional[int]:
+        """The body size declared by the client, if any"""
+        content_length = self.headers.get("content-length")
+        if content_length is None or not content_length.isdigit():
+            return None
+        return int(content_length)
+
+    def check_content_length(self):
+        """Rejects a body that is declared larger than max_body_size before any of it is read"""
+        if self.max_body_size is not None:
+            content_length = self.content_length
+            if content_length is not None and content_length > self.max_body_size:
+                raise RequestEntityTooLargeException(
+                    f"request body of {content_length} bytes exceeds the limit of {self.max_body_size} bytes")
+
+    async def _receive_message(self, deadline: Optional[float]) -> AsgiMessage:
+        """Waits for the next message, limited by the idle timeout and the remaining total time"""
+        timeout = self.body_idle_timeout
+        if deadline is not None:
+            remaining = deadline - asyncio.get_running_loop().time()
+            timeout = remaining if timeout is None else min(timeout, remaining)
+
+        if timeout is None:
+            return await self.receive()
+        try:
+            return await asyncio.wait_for(self.receive(), max(timeout, 0))
+        except asyncio.TimeoutError:
+            raise RequestTimeoutException("timed out reading the request body") from None
+
+    async def stream(self, decode: bool = True) -> AsyncIterator[bytes]:
+        """
+        Reads the request body chunk by chunk without buffering it
+        max_body_size, body_idle_timeout and body_timeout are enforced while reading
+
+        A gzip or deflate body is decompressed as it is received, within max_decompressed_size
+        and max_compression_ratio. With decode=False the body is read as it was sent,
+        also after `body()` has read and decompressed it, which keeps the compressed body for that
+        """
+        if self._body is not None:
+            body = self._raw_body if not decode and self._raw_body is not None else self._body
+            if body:
+                yield body
+            return
+
+        decompressor = self._get_decompressor() if decode else None
+        if decompressor is None:
+            async for chunk in self._stream():
+                yield chunk
+            return
+
+        async for chunk in self._stream():
+            for output in decompressor.decompress(chunk):
+                yield output
+        output = decompressor.flush()
+        if output:
+            yield output
+
+    def _get_decompressor(self):
+        encoding = self.headers.get("content-encoding", "").strip().lower()
+        if not encoding or encoding == "identity":
+            return None
+
+        from .compression import Decompressor
+
+        return Decompressor(encoding, self.max_decompressed_size, self.max_compression_ratio)
+
+    async def _stream(self) -> AsyncIterator[bytes]:
+        if self._body is not None:
+            if self._body:
+                yield self._body
+            return
+        if self._consumed:
+            raise RuntimeError("The request body has already been consumed")
+        self._consumed = True
+        self.check_content_length()
+
+        deadline = None
+        if self.body_timeout is not None:
+            deadline = asyncio.get_running_loop().time() + self.body_timeout
+
+        size = 0
+        while True:
+            message: AsgiMessage = await self._receive_message(deadline)
+            chunk = message.get("body", b"")
+            if chunk:
+                size += len(chunk)
+                if self.max_body_size is not None and size > self.max_body_size:
+                    raise RequestEntityTooLargeException(
+                        f"request body exceeds the limit of {self.max_body_size} bytes")
+                yield chunk
+            if not message.get("more_body"):
+                break
+
+    async def iter_json_lines(self, max_line_size: Optional[int] = 1024 * 1024) -> AsyncIterator[Any]:
+        """
+        Parses newline delimited JSON records from the body as it is received
+        Only the current incomplete line is kept in memory, a line larger than max_line_size bytes
+        raises RequestEntityTooLargeException
+        """
+        pending = bytearray()
+        async for chunk in self.stream():
+            start = 0
+            # Only the new chunk is searched, the incomplete line is never copied again
             while True:
-                message: AsgiMessage = await self.receive()
-                self._body += message.get("body", b"")
-                if not message.get("more_body"):
+                end = chunk.find(b"\n", start)
+                if end < 0:
                     break
+                pending += chunk[start:end]
+                start = end + 1
+                self._check_line_size(pending, max_line_size)
+                if pending.strip():
+                    yield json.loads(pending)
+                pending.clear()
+            pending += chunk[start:]
+            self._check_line_size(pending, max_line_size)
+        if pending.strip():
+            yield json.loads(pending)
+
+    @staticmethod
+    def _check_line_size(line: bytearray, max_line_size: Optional[int]):
+        if max_line_size is not None and len(line) > max_line_size:
+            raise RequestEntityTooLargeException(f"a JSON line exceeds the limit of {max_line_size} bytes")
+
+    async def body(self) -> bytes:
+        """Cache lazy parsing request body"""
+        if self._body is None:
+            if self._consumed and self._files is not None:
+                raise RuntimeError(
+                    "The multipart body was streamed into `form()` and `files()` and is not kept, use them instead")
+            decompressor = self._get_decompressor()
+            body = b"".join([chunk async for chunk in self._stream()])
+            if decompressor is not None:
+                # A proxied request is still forwarded with its content-encoding, see `stream(decode=False)`
+                self._raw_body = body
+                body = b"".join([*decompressor.decompress(body), decompressor.flush()])
+            self._body = body
         return self._body
 
     async def text(self) -> str:
@@ -111,16 +269,25 @@ class Request:
 
     async def form(self) -> MultiDict:
         """The cache lazy loads data from the form"""
-        if not self._forms:
+        if self._forms is None:
+            from .forms import parse_form_data
             self._forms, self._files = await parse_form_data(self)
         return self._forms
 
-    async def files(self) -> MultiDict[SpooledTemporaryFile]:
+    async def files(self) -> MultiDict["SpooledTemporaryFile"]:
         """Cache lazy loading from files uploaded in the form"""
-        if not self._files:
+        if self._files is None:
+            from .forms import parse_form_data
             self._forms, self._files = await parse_form_data(self)
         return self._files
 
+    async def save_files(self, directory) -> Dict[str, List[str]]:
+        """
+        Saves all the files uploaded in the form into directory, returns the saved paths by field name
+        """
+        from .datastructures import save_files
+        return await save_files(await self.files(), directory)
+
     async def json(self) -> JsonMapping:
         """An attempt was made to deserialize and return the request body data in JSON format"""
         if not self._json:
@@ -128,13 +295,41 @@ class Request:
             self._json = json.loads(text) if text else {}
         return self._json
 
-    async def data(self) -> Union[MultiDict, JsonMapping, str]:
+    async def msgpack(self) -> Any:
+        """An attempt was made to deserialize and return the request body data in MessagePack format"""
+        if self._msgpack is None:
+            from .serializers import msgpack_loads
+            body = await self.body()
+            self._msgpack = msgpack_loads(body) if body else {}
+        return self._msgpack
+
+    async def data(self) -> Union[MultiDict, JsonMapping, Any, str]:
         """Get different results depending on the type of request"""
         content_type = self.content["content-type"]
         if content_type == "application/json":
             return await self.json()
+        if content_type in ("application/msgpack", "application/x-msgpack"):
+            return await self.msgpack()
         if content_type == "multipart/form-data":
             return await self.form()
         if content_type == "application/x-www-form-urlencoded":
             return await self.form()
-        return self.text()
+        return await self.text()
+
+
+def get_request_parameter(handler: Callable) -> Optional[str]:
+    """
+    Returns the name of the parameter a handler declares to receive the Request explicitly
+    It is a parameter annotated with `Request` or, without an annotation, named `request`
+    """
+    try:
+        parameters = inspect.signature(handler).parameters.values()
+    except (TypeError, ValueError):
+        return None
+
+    for parameter in parameters:
+        if parameter.annotation is Request or parameter.annotation == Request.__name__:
+            return parameter.name
+        if parameter.name == "request" and parameter.annotation is inspect.Parameter.empty:
+            return parameter.name
+    return None
@@ -1,15 +1,16 @@
 import json
 from http import HTTPStatus
-from http.cookies import SimpleCookie
-from typing import Optional
+from typing import Any, AsyncIterable, Iterable, Optional, Union, TYPE_CHECKING
 from urllib.parse import quote_plus
 
 from multidict import MultiDict
-from markupsafe import escape
 
 from .types import AsgiScope, AsgiReceive, AsgiSend
 from .constants import DEFAULT_CODING, DEFAULT_CHARSET
 
+if TYPE_CHECKING:
+    from http.cookies import SimpleCookie
+
 
 class Response:
     status_code: int = HTTPStatus.OK.value
@@ -17,7 +18,8 @@ class Response:
 
     def __init__(self, content, *, status_code=200, content_type=None, headers=None, cookies=None) -> None:
         self.status_code = status_code
-        self.cookies = SimpleCookie(cookies)
+        self._cookies: Optional["SimpleCookie"] = None
+        self._initial_cookies = cookies
         self.headers = MultiDict(headers or {})
         self.content = self.handle_content(content)
 
@@ -28,6 +30,18 @@ class Response:
 
             self.headers.setdefault("content-type", content_type)
 
+    @property
+    def cookies(self) -> "SimpleCookie":
+        """Most responses never set a cookie, so the cookie jar is created on first access"""
+        if self._cookies is None:
+            from http.cookies import SimpleCookie
+            self._cookies = SimpleCookie(self._initial_cookies)
+        return self._cookies
+
+    @cookies.setter
+    def cookies(self, cookies: "SimpleCookie"):
+        self._cookies = cookies
+
     def handle_content(self, content):
 
         if not isinstance(content, bytes):
@@ -35,24 +49,33 @@ class Response:
 
         return content
 
-    async def __call__(self, scope: AsgiScope, receive: AsgiReceive, send: AsgiSend) -> None:
-        self.headers.setdefault("content-length", str(len(self.content)))
-
+    def get_raw_headers(self):
         headers = [
             (key.encode(DEFAULT_CHARSET), str(val).encode(DEFAULT_CHARSET))
             for key, val in self.headers.items()
         ]
 
-        for cookie in self.cookies.values():
-            headers = [
-                *headers,
-                (b"set-cookie", cookie.output(header="").strip().encode(DEFAULT_CHARSET)),
-            ]
+        if self._cookies is not None or self._initial_cookies:
+            for cookie in self.cookies.values():
+                headers = [
+                    *headers,
+                    (b"set-cookie", cookie.output(header="").strip().encode(DEFAULT_CHARSET)),
+                ]
+        return headers
+
+    async def prepare(self) -> None:
+        """
+        Called before the response is sent, while the errors of the request are still handled,
+        a response that builds its content late does it here so a failure becomes an error response
+        """
+
+    async def __call__(self, scope: AsgiScope, receive: AsgiReceive, send: AsgiSend) -> None:
+        self.headers.setdefault("content-length", str(len(self.content)))
 
         await send({
             "type": "http.response.start",
             "status": self.status_code,
-            "headers": headers,
+            "headers": self.get_raw_headers(),
         })
 
         await send({"type": "http.response.body", "body": self.content})
@@ -76,6 +99,68 @@ class JsonResponse(Response):
         return json.dumps(content, ensure_ascii=False).encode("utf-8")
 
 
+class MsgPackResponse(Response):
+    content_type = "application/msgpack"
+
+    def handle_content(self, content):
+        from .serializers import msgpack_dumps
+        return msgpack_dumps(content)
+
+
+class StreamResponse(Response):
+    """
+    A response whose body is sent chunk by chunk from an iterator or an async iterator
+    The content length is unknown, so the server uses chunked transfer encoding
+    """
+
+    def handle_content(self, content: Union[Iterable[Any], AsyncIterable[Any]]):
+        return content
+
+    def encode_chunk(self, chunk) -> bytes:
+        if not isinstance(chunk, bytes):
+            return str(chunk).encode(DEFAULT_CODING)
+        return chunk
+
+    async def iter_content(self):
+        if hasattr(self.content, "__aiter__"):
+            async for chunk in self.content:
+                yield chunk
+        else:
+            for chunk in self.content:
+                yield chunk
+
+    async def __call__(self, scope: AsgiScope, receive: AsgiReceive, send: AsgiSend) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.get_raw_headers(),
+        })
+
+        chunks = self.iter_content()
+        try:
+            async for chunk in chunks:
+                # The client went away, the rest of the content is not produced
+                if scope.get("disconnected"):
+                    return
+                body = self.encode_chunk(chunk)
+                if body:
+                    await send({"type": "http.response.body", "body": body, "more_body": True})
+        finally:
+            await chunks.aclose()
+
+        await send({"type": "http.response.body", "body": b""})
+
+
+class JsonLinesResponse(StreamResponse):
+    """
+    Streams the items of an iterator or an async iterator as newline delimited JSON, one line per item
+    """
+    content_type = "application/x-ndjson"
+
+    def encode_chunk(self, chunk) -> bytes:
+        return json.dumps(chunk, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
 class RedirectResponse(Response):
     status_code: int = HTTPStatus.TEMPORARY_REDIRECT.value
 
@@ -111,6 +196,8 @@ class ErrorResponse(Response):
         )
 
     def get_err_page(self, code, name, descript):
+        from markupsafe import escape
+
         return (
             "<!doctype html>\n"
             "<html lang=en>\n"
@@ -1,14 +1,19 @@
 import inspect
-from typing import Optional, ClassVar, Type, Tuple, Callable, TYPE_CHECKING
+import functools
+from typing import Any, Dict, Optional, ClassVar, Type, Tuple, Callable, Union, TYPE_CHECKING
 
 from http_router import Router as HttpRouter
 
 from .exceptions import RouterException, NotFoundException, InvalidMethodException
 from .views import View
+from .cors import CorsPolicy
+from .disconnect import DISCONNECT_MODES
+from .request import get_request_parameter
 
 
 if TYPE_CHECKING:
     from http_router.types import TVObj, TPath, TMethodsArg
+    from .events import HookChain
 
 
 class Router(HttpRouter):
@@ -16,13 +21,29 @@ class Router(HttpRouter):
     NotFoundError: ClassVar[Type[Exception]] = NotFoundException
     InvalidMethodError: ClassVar[Type[Exception]] = InvalidMethodException
 
+    # Whether a route has its own CORS policy, otherwise CORS never needs to match a route
+    has_cors: bool = False
+
     def route(
         self,
         *paths: "TPath",
         methods: Optional["TMethodsArg"] = None,
+        hooks: Optional["HookChain"] = None,
+        max_body_size: Optional[int] = None,
+        cors: Union[CorsPolicy, Dict[str, Any], bool, None] = None,
+        on_disconnect: Optional[str] = None,
         **opts,
     ) -> Callable[["TVObj"], "TVObj"]:
-        """Register a route."""
+        """
+        Register a route.
+
+        hooks         : The request hooks of the route, the hooks of the application are used by default
+        max_body_size : The maximum request body size of the route, the application limit is used by default
+        cors          : The CORS policy of the route or the options of one, False disables the policy of the application
+        on_disconnect : "flag" or "cancel", see `Application`, the mode of the application is used by default
+        """
+        if on_disconnect is not None and on_disconnect not in DISCONNECT_MODES:
+            raise self.RouterError(f"Invalid on_disconnect: {on_disconnect!r}")
 
         def wrapper(target: "TVObj") -> "TVObj":
             nonlocal methods
@@ -44,15 +65,58 @@ class Router(HttpRouter):
                 raise self.RouterError("Invalid target: %r" % target)
 
             target = self.converter(target)
-            self.bind(target, *paths, methods=methods, **opts)
+            handler = self.make_route_handler(target)
+            if hooks is not None:
+                handler.__hooks__ = hooks
+            if max_body_size is not None:
+                handler.__max_body_size__ = max_body_size
+            if cors is not None:
+                handler.__cors__ = CorsPolicy(**cors) if isinstance(cors, dict) else cors
+                self.has_cors = True
+            if on_disconnect is not None:
+                handler.__on_disconnect__ = on_disconnect
+            self.set_route_template(handler, paths)
+            self.set_request_parameter(handler)
+            self.bind(handler, *paths, methods=methods, **opts)
             return target
 
         return wrapper
 
-    def add_routes(self, *routes):
+    def add_routes(self, *routes, hooks: Optional["HookChain"] = None):
         """
         Add routes should support all methods for FBV, so super's route method is called here
         """
         for route_rule in routes:
             *paths, handle = route_rule
+            handle = self.make_route_handler(handle)
+            if hooks is not None:
+                handle.__hooks__ = hooks
+            self.set_route_template(handle, paths)
+            self.set_request_parameter(handle)
             super().route(*paths)(handle)
+
+    @staticmethod
+    def make_route_handler(target):
+        """
+        Wraps the target once per registration, the options of a route are set on the wrapper
+        so a function registered on several routes or blueprints keeps the options of each route
+        """
+        return functools.update_wrapper(functools.partial(target), target)
+
+    @staticmethod
+    def set_route_template(target, paths):
+        """
+        Records the registered paths of the target, they are exposed as `scope["route"]` to group requests by route
+        """
+        target.__route_template__ = " | ".join(getattr(path, "pattern", path) for path in paths)
+
+    @staticmethod
+    def set_request_parameter(target):
+        """
+        Records the parameter that receives the Request, so it is resolved once at registration
+        Class-Based Views already declare it in `as_view`
+        """
+        if not hasattr(target, "__request_param__"):
+            request_param = get_request_parameter(target)
+            if request_param is not None:
+                target.__request_param__ = request_param
@@ -0,0 +1,231 @@
+import gc
+import os
+import sys
+import time
+import signal
+import socket
+from typing import Any, Dict, Optional, TYPE_CHECKING
+
+# This module is only imported by `Application.run`, uvicorn is already needed there
+from uvicorn import Config, Server
+
+from .logs import logger
+
+if TYPE_CHECKING:
+    from .application import Application
+
+
+class DrainingServer(Server):
+    """
+    A uvicorn server that drains the application as soon as it receives SIGINT or SIGTERM
+
+    uvicorn closes its listener and waits for the open connections before the lifespan shutdown,
+    so draining from the shutdown alone would never fail a readiness probe.
+    Here readiness probes fail at the signal, the server keeps serving for `app.drain_delay` seconds
+    so the load balancer stops routing to it, then it shuts down and the requests that still arrive
+    on open connections get a 503. A second signal shuts down at once
+    """
+
+    def __init__(self, config: Config, app: "Application"):
+        super().__init__(config)
+        self.app = app
+        self._exit_signal: Optional[int] = None
+        self._exit_at: Optional[float] = None
+
+    def handle_exit(self, sig, frame):
+        # Only flags are set in the signal handler, the application is drained from on_tick
+        if self._exit_signal is None and self.app.drain_delay > 0:
+            self._exit_signal = sig
+            self._exit_at = time.monotonic() + self.app.drain_delay
+            return
+        super().handle_exit(sig, frame)
+
+    async def on_tick(self, counter: int) -> bool:
+        if self.should_exit:
+            self.app.start_draining()
+        elif self._exit_at is not None:
+            self.app.start_draining(reject=False)
+            if time.monotonic() >= self._exit_at:
+                self.app.start_draining()
+                super().handle_exit(self._exit_signal, None)
+        return await super().on_tick(counter)
+
+
+def serve(app: "Application", asgi_app: Any, **config: Any):
+    """
+    Serves asgi_app from this process with a `DrainingServer` of app, config is passed to `uvicorn.Config`
+    """
+    server = DrainingServer(Config(asgi_app, **config), app)
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        pass
+    if not server.started:
+        sys.exit(3)
+
+
+class PreforkRunner:
+    """
+    Serves an application that is already imported from N forked worker processes
+
+    The master process binds the listening socket and forks the workers after the application
+    has been imported, so data loaded at import time is shared copy-on-write between workers.
+    Workers that die are restarted until the master receives SIGINT or SIGTERM,
+    which is forwarded to the workers so each one drains, see `DrainingServer`.
+
+    ---
+    from razor.server.runner import PreforkRunner
+
+    PreforkRunner(app, host="0.0.0.0", port=5200, workers=8).run()
+    ---
+    """
+
+    # Seconds between two checks for dead workers
+    SUPERVISE_INTERVAL = 0.5
+
+    def __init__(
+        self,
+        app: "Application",
+        host: str = "127.0.0.1",
+        port: int = 5200,
+        workers: int = 2,
+        reuse_port: bool = False,
+        graceful_timeout: float = 30,
+        **config: Any
+    ):
+        """
+        reuse_port       : Each worker binds its own socket with SO_REUSEPORT instead of sharing the socket of the master
+        graceful_timeout : Seconds the workers have to exit on shutdown before they are killed,
+                           it should cover `app.drain_delay` and `app.drain_timeout`
+        config           : The remaining parameters are passed to `uvicorn.Config`
+        """
+        if not hasattr(os, "fork"):
+            raise RuntimeError("The prefork runner requires os.fork, which is not available on this platform")
+        if reuse_port and not hasattr(socket, "SO_REUSEPORT"):
+            raise RuntimeError("SO_REUSEPORT is not available on this platform")
+
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.reuse_port = reuse_port
+        self.graceful_timeout = graceful_timeout
+        self.config = config
+
+        self._socket: Optional[socket.socket] = None
+        self._pids: Dict[int, float] = {}
+        self._should_exit = False
+
+    def bind_socket(self) -> socket.socket:
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        sock = socket.socket(family=family)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((self.host, self.port))
+        sock.set_inheritable(True)
+        return sock
+
+    def run(self):
+        # Creating the config in the master configures logging once for every worker
+        self.uvicorn_config = Config(self.app, host=self.host, port=self.port, **self.config)
+
+        if not self.reuse_port:
+            self._socket = self.bind_socket()
+
+        # The shared memory is inherited by every worker
+        if getattr(self.app, "shared_store", None) is not None:
+            self.app.shared_store.create()
+
+        # Objects that exist before the fork are moved out of the collector,
+        # so its bookkeeping does not write to and copy the shared pages
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGINT, self._handle_exit)
+        signal.signal(signal.SIGTERM, self._handle_exit)
+
+        logger.info(f"Started prefork master process [{os.getpid()}]")
+        for _ in range(self.workers):
+            self._spawn_worker()
+
+        while not self._should_exit:
+            self._reap_workers()
+            time.sleep(self.SUPERVISE_INTERVAL)
+
+        self._stop_workers()
+        if self._socket is not None:
+            self._socket.close()
+        logger.info(f"Stopped prefork master process [{os.getpid()}]")
+
+    def _handle_exit(self, sig, frame):
+        self._should_exit = True
+
+    def _spawn_worker(self):
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                self._run_worker()
+            except BaseException:
+                logger.exception("Worker process failed")
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+
+        self._pids[pid] = time.monotonic()
+        logger.info(f"Started worker process [{pid}]")
+
+    def _run_worker(self):
+        # The uvicorn server installs its own handlers for a graceful shutdown
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+        sock = self._socket or self.bind_socket()
+        DrainingServer(self.uvicorn_config, self.app).run(sockets=[sock])
+
+    def _reap_workers(self):
+        while self._pids:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+
+            started = self._pids.pop(pid, None)
+            if started is None or self._should_exit:
+                continue
+
+            logger.warning(f"Worker process [{pid}] died with exit code {os.waitstatus_to_exitcode(status)}, restarting")
+            # A worker that dies right after starting is not restarted in a tight loop
+            if time.monotonic() - started < 1:
+                time.sleep(1)
+            self._spawn_worker()
+
+    def _stop_workers(self):
+        for pid in self._pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        deadline = time.monotonic() + self.graceful_timeout
+        while self._pids and time.monotonic() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                time.sleep(0.1)
+            else:
+                self._pids.pop(pid, None)
+
+        for pid in self._pids:
+            logger.warning(f"Worker process [{pid}] did not exit in time, killing it")
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self._pids.clear()
@@ -0,0 +1,213 @@
+import os
+import time
+import random
+import asyncio
+import inspect
+import tempfile
+from typing import Any, Callable, Dict, IO, List, MutableMapping, Optional
+
+from .logs import logger
+from .response import JsonResponse
+from .types import AsgiScope, AsgiReceive, AsgiSend
+
+
+class LeaderLock:
+    """
+    A lock file that one process of the machine holds, the operating system releases it when the process exits
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file: Optional[IO[bytes]] = None
+
+    @property
+    def held(self) -> bool:
+        return self._file is not None
+
+    def acquire(self) -> bool:
+        if self._file is not None:
+            return True
+        try:
+            import fcntl
+        except ImportError:
+            # Without fcntl every process is its own leader
+            return True
+
+        file = open(self.path, "a+b")
+        try:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            file.close()
+            return False
+        self._file = file
+        return True
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class PeriodicJob:
+    """
+    An async function that runs every `seconds`, see `Application.every`
+
+    A run that is still going when the next one is due makes that one skipped, runs never overlap.
+    A job that declares a parameter receives the lifespan state
+    """
+
+    def __init__(
+        self,
+        func: Callable,
+        seconds: float,
+        jitter: float = 0,
+        timeout: Optional[float] = None,
+        leader_only: bool = False,
+        name: Optional[str] = None
+    ):
+        if not inspect.iscoroutinefunction(func):
+            raise TypeError(f"A periodic job must be an async function: {func!r}")
+
+        self.func = func
+        self.seconds = seconds
+        self.jitter = jitter
+        self.timeout = timeout
+        self.leader_only = leader_only
+        self.name = name or func.__name__
+        self.takes_state = bool(inspect.signature(func).parameters)
+        self.lock: Optional[LeaderLock] = None
+
+        self.runs = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.skipped = 0
+        self.total_duration = 0.0
+        self.max_duration = 0.0
+        self.last_duration: Optional[float] = None
+        self.last_run_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+        self._running: Optional[asyncio.Task] = None
+
+    async def schedule(self, state: MutableMapping[str, Any]):
+        """
+        The loop of the job, it runs until it is cancelled at shutdown
+        """
+        loop = asyncio.get_running_loop()
+        next_run = loop.time()
+        overrun = False
+        try:
+            while True:
+                # The jitter spreads the runs of the workers and of the jobs that share an interval
+                next_run += self.seconds
+                delay = next_run - loop.time() + random.uniform(0, self.jitter)
+                await asyncio.sleep(max(delay, 0))
+
+                if self.leader_only and not self.lock.acquire():
+                    continue
+                if self._running is not None and not self._running.done():
+                    self.skipped += 1
+                    # Logged once per overrun, a long run would otherwise log on every tick
+                    if not overrun:
+                        overrun = True
+                        logger.warning(f"Periodic job {self.name} is still running, its next runs are skipped")
+                    continue
+                overrun = False
+                self._running = asyncio.ensure_future(self.run(state))
+        finally:
+            # The shutdown hooks that require the scheduler run once the job has unwound
+            if self._running is not None and not self._running.done():
+                self._running.cancel()
+                try:
+                    await self._running
+                except asyncio.CancelledError:
+                    pass
+            if self.lock is not None:
+                self.lock.release()
+
+    async def run(self, state: MutableMapping[str, Any]):
+        self.last_run_at = time.time()
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.func(state) if self.takes_state else self.func(), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self.last_error = f"timed out after {self.timeout}s"
+            logger.error(f"Periodic job {self.name} timed out after {self.timeout}s")
+        except Exception as exc:
+            # A failed run does not stop the job, the next one runs on schedule
+            self.failures += 1
+            self.last_error = repr(exc)
+            logger.exception(f"Periodic job {self.name} failed: {exc!r}")
+        finally:
+            duration = time.perf_counter() - start
+            self.runs += 1
+            self.total_duration += duration
+            self.max_duration = max(self.max_duration, duration)
+            self.last_duration = duration
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "seconds": self.seconds,
+            "leader": self.lock.held if self.lock is not None else None,
+            "running": self._running is not None and not self._running.done(),
+            "runs": self.runs,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "skipped": self.skipped,
+            "mean_duration_ms": round(self.total_duration / self.runs * 1000, 3) if self.runs else None,
+            "max_duration_ms": round(self.max_duration * 1000, 3),
+            "last_duration_ms": round(self.last_duration * 1000, 3) if self.last_duration is not None else None,
+            "last_run_at": self.last_run_at,
+            "last_error": self.last_error,
+        }
+
+    def __call__(self, *args, **kwargs):
+        # The job can still be awaited directly, to warm up a value at startup for example
+        return self.func(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.name} every {self.seconds}s>"
+
+
+class Scheduler:
+    """
+    Runs the periodic jobs of an application from lifespan startup until shutdown
+
+    Jobs with leader_only run in a single process of the machine, the one that holds the lock file
+    of the job in lock_directory. When that process exits another one takes over at its next run.
+
+    The scheduler is an ASGI callable that returns the metrics of the jobs as JSON
+
+    app.bare_route("/_debug/jobs")(app.scheduler)
+    """
+
+    def __init__(self, name: str, lock_directory: Optional[str] = None):
+        self.name = name
+        self.lock_directory = lock_directory or tempfile.gettempdir()
+        self.jobs: List[PeriodicJob] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def add(self, job: PeriodicJob) -> PeriodicJob:
+        if any(registered.name == job.name for registered in self.jobs):
+            raise ValueError(f"A periodic job named {job.name!r} already exists")
+        if job.leader_only:
+            filename = f"razor-{self.name}-{job.name}.lock".replace(os.sep, "_")
+            job.lock = LeaderLock(os.path.join(self.lock_directory, filename))
+        self.jobs.append(job)
+        return job
+
+    async def start(self, state: MutableMapping[str, Any]):
+        self._tasks = [asyncio.ensure_future(job.schedule(state)) for job in self.jobs]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        return {job.name: job.metrics() for job in self.jobs}
+
+    async def __call__(self, scope: AsgiScope, receive: AsgiReceive, send: AsgiSend):
+        await JsonResponse(self.metrics())(scope, receive, send)
@@ -0,0 +1,22 @@
+from typing import Any
+
+
+def import_msgpack():
+    """
+    msgpack is an optional dependency, install it with `pip install http-razor[msgpack]`
+    """
+    try:
+        import msgpack
+    except ImportError:
+        raise RuntimeError("MessagePack support requires the `msgpack` package, "
+                           "install it with `pip install http-razor[msgpack]`") from None
+    return msgpack
+
+
+def msgpack_dumps(content: Any) -> bytes:
+    return import_msgpack().packb(content, use_bin_type=True)
+
+
+def msgpack_loads(data: bytes) -> Any:
+    # Bytes are decoded directly, there is no round trip through text
+    return import_msgpack().unpackb(data, raw=False)
@@ -0,0 +1,303 @@
+import os
+import time
+import atexit
+import pickle
+import struct
+import hashlib
+import multiprocessing
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from .logs import logger
+from .exceptions import SharedStoreLockTimeoutException
+
+
+# Counter slot: used, key hash, key length, key, value
+COUNTER_SLOT = struct.Struct("<BQB64sq")
+# Cache slot header: state, key hash, key length, key, expires at, value length
+CACHE_SLOT = struct.Struct("<BQB64sdI")
+# The pid of the process holding the lock of a stripe, 0 when it is free
+LOCK_OWNER = struct.Struct("<q")
+
+MAX_KEY_SIZE = 64
+
+SLOT_EMPTY = 0
+SLOT_USED = 1
+SLOT_DELETED = 2
+
+
+class SharedStore:
+    """
+    Counters and a small cache in shared memory, shared by every worker process of one machine
+
+    Both tables are fixed-size hash tables split into stripes, each stripe has its own lock
+    and a key only ever probes the slots of its stripe, so operations on different stripes never contend.
+    The operations are synchronous, waiting for a lock blocks the event loop of the worker.
+    A lock is only held for a few microseconds, so waits are normally much shorter than lock_timeout,
+    an operation blocks for 2 * lock_timeout at most: a lock left held by a worker that was killed
+    is released by the next process that times out on it, if its holder is still alive
+    SharedStoreLockTimeoutException is raised. On a busy machine a holder that the OS preempts
+    can make a waiter time out, treat the exception like a cache miss or retry later.
+
+    The memory and the locks are created in the master process before the workers are forked,
+    the workers attach to them at lifespan startup, see `Application.enable_shared_store`
+
+    counters     : The number of counter slots
+    slots        : The number of cache slots
+    value_size   : The maximum size of a pickled cache value
+    stripes      : The number of locks
+    lock_timeout : Seconds an operation waits for the lock of its stripe, keep it to a few milliseconds
+    """
+
+    def __init__(
+        self,
+        counters: int = 1024,
+        slots: int = 4096,
+        value_size: int = 256,
+        stripes: int = 64,
+        lock_timeout: float = 0.01
+    ):
+        self.stripes = stripes
+        self.lock_timeout = lock_timeout
+        self.counter_stripe_size = max(counters // stripes, 1)
+        self.cache_stripe_size = max(slots // stripes, 1)
+        self.value_size = value_size
+
+        self.counter_slot_size = COUNTER_SLOT.size
+        self.cache_slot_size = CACHE_SLOT.size + value_size
+        self.counters_size = self.counter_slot_size * self.counter_stripe_size * stripes
+        self.owners_offset = self.counters_size + self.cache_slot_size * self.cache_stripe_size * stripes
+        self.size = self.owners_offset + LOCK_OWNER.size * stripes
+
+        self.shm = None
+        self._locks: List[Any] = []
+        self._creator_pid: Optional[int] = None
+
+    @property
+    def created(self) -> bool:
+        return self.shm is not None
+
+    def create(self):
+        """
+        Allocates the shared memory and the locks, it must happen before the workers are forked
+        """
+        from multiprocessing.shared_memory import SharedMemory
+
+        if self.created:
+            return
+        self.shm = SharedMemory(create=True, size=self.size)
+        self.shm.buf[:self.size] = bytes(self.size)
+        self._locks = [multiprocessing.Lock() for _ in range(self.stripes)]
+        self._creator_pid = os.getpid()
+        atexit.register(self.close)
+
+    def attach(self):
+        """
+        Called by each worker at lifespan startup, a single process creates the store itself
+        """
+        if not self.created:
+            self.create()
+
+    def close(self):
+        """
+        Releases the shared memory, the process that created it also unlinks it
+        """
+        if self.shm is None:
+            return
+        self.shm.close()
+        if self._creator_pid == os.getpid():
+            self.shm.unlink()
+        self.shm = None
+
+    @staticmethod
+    def _hash(key: bytes) -> int:
+        # The builtin hash is randomized per process, the slots must be the same in every worker
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+    @staticmethod
+    def _encode_key(key: str) -> bytes:
+        encoded = key.encode("utf-8")
+        if len(encoded) > MAX_KEY_SIZE:
+            raise ValueError(f"shared store keys are limited to {MAX_KEY_SIZE} bytes: {key!r}")
+        return encoded
+
+    def _probe(self, key_hash: int, stripe_size: int, slot_size: int, base: int = 0) -> Iterator[int]:
+        stripe = key_hash % self.stripes
+        start = (key_hash // self.stripes) % stripe_size
+        for i in range(stripe_size):
+            yield base + (stripe * stripe_size + (start + i) % stripe_size) * slot_size
+
+    def _lock(self, key_hash: int):
+        return self._locked(key_hash % self.stripes)
+
+    @contextmanager
+    def _locked(self, stripe: int):
+        if self.shm is None:
+            raise RuntimeError("The shared store is not attached, it is attached at lifespan startup")
+        lock = self._locks[stripe]
+        owner_offset = self.owners_offset + stripe * LOCK_OWNER.size
+
+        if not lock.acquire(timeout=self.lock_timeout):
+            self._release_abandoned(lock, stripe, owner_offset)
+            if not lock.acquire(timeout=self.lock_timeout):
+                raise SharedStoreLockTimeoutException(
+                    f"Timed out after {self.lock_timeout}s waiting for the lock of shared store stripe {stripe}")
+        LOCK_OWNER.pack_into(self.shm.buf, owner_offset, os.getpid())
+        try:
+            yield
+        finally:
+            LOCK_OWNER.pack_into(self.shm.buf, owner_offset, 0)
+            lock.release()
+
+    def _release_abandoned(self, lock, stripe: int, owner_offset: int):
+        """
+        Releases the lock of a stripe whose holder no longer exists, it was killed while holding it
+        """
+        owner, = LOCK_OWNER.unpack_from(self.shm.buf, owner_offset)
+        if not owner or owner == os.getpid():
+            return
+        try:
+            os.kill(owner, 0)
+            return
+        except ProcessLookupError:
+            pass
+        except PermissionError:
+            # The pid was reused by a process of another user
+            pass
+
+        logger.warning(f"Releasing the lock of shared store stripe {stripe} held by dead process [{owner}]")
+        LOCK_OWNER.pack_into(self.shm.buf, owner_offset, 0)
+        try:
+            lock.release()
+        except ValueError:
+            # Another process released it first
+            pass
+
+    def incr(self, key: str, delta: int = 1) -> int:
+        """
+        Atomically adds delta to a counter and returns the new value
+        """
+        encoded = self._encode_key(key)
+        key_hash = self._hash(encoded)
+
+        with self._lock(key_hash):
+            buf = self.shm.buf
+            for offset in self._probe(key_hash, self.counter_stripe_size, self.counter_slot_size):
+                used, slot_hash, key_size, slot_key, value = COUNTER_SLOT.unpack_from(buf, offset)
+                if not used:
+                    COUNTER_SLOT.pack_into(buf, offset, SLOT_USED, key_hash, len(encoded), encoded, delta)
+                    return delta
+                if slot_hash == key_hash and slot_key[:key_size] == encoded:
+                    value += delta
+                    COUNTER_SLOT.pack_into(buf, offset, SLOT_USED, key_hash, key_size, slot_key, value)
+                    return value
+        raise RuntimeError(f"The shared counter table is full, cannot add {key!r}")
+
+    def get_counter(self, key: str) -> int:
+        encoded = self._encode_key(key)
+        key_hash = self._hash(encoded)
+
+        with self._lock(key_hash):
+            for offset in self._probe(key_hash, self.counter_stripe_size, self.counter_slot_size):
+                used, slot_hash, key_size, slot_key, value = COUNTER_SLOT.unpack_from(self.shm.buf, offset)
+                if not used:
+                    return 0
+                if slot_hash == key_hash and slot_key[:key_size] == encoded:
+                    return value
+        return 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        encoded = self._encode_key(key)
+        key_hash = self._hash(encoded)
+        now = time.time()
+
+        with self._lock(key_hash):
+            buf = self.shm.buf
+            for offset in self._probe(key_hash, self.cache_stripe_size, self.cache_slot_size, self.counters_size):
+                state, slot_hash, key_size, slot_key, expires, value_size = CACHE_SLOT.unpack_from(buf, offset)
+                if state == SLOT_EMPTY:
+                    break
+                if state == SLOT_USED and slot_hash == key_hash and slot_key[:key_size] == encoded:
+                    if expires and expires <= now:
+                        break
+                    start = offset + CACHE_SLOT.size
+                    value = bytes(buf[start:start + value_size])
+                    return pickle.loads(value)
+        return default
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """
+        Stores a small value, when the stripe is full the value closest to expiry is evicted
+        """
+        encoded = self._encode_key(key)
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.value_size:
+            raise ValueError(f"shared store values are limited to {self.value_size} bytes, got {len(data)}")
+        key_hash = self._hash(encoded)
+        now = time.time()
+        expires = now + ttl if ttl else 0.0
+
+        with self._lock(key_hash):
+            buf = self.shm.buf
+            target = victim = None
+            victim_expires = float("inf")
+            for offset in self._probe(key_hash, self.cache_stripe_size, self.cache_slot_size, self.counters_size):
+                state, slot_hash, key_size, slot_key, slot_expires, _ = CACHE_SLOT.unpack_from(buf, offset)
+                if state == SLOT_USED and slot_hash == key_hash and slot_key[:key_size] == encoded:
+                    target = offset
+                    break
+                if state == SLOT_EMPTY:
+                    target = target if target is not None else offset
+                    break
+                if target is None and (state == SLOT_DELETED or (slot_expires and slot_expires <= now)):
+                    target = offset
+                # Values without a ttl are evicted last
+                slot_expires = slot_expires or float("inf")
+                if victim is None or slot_expires < victim_expires:
+                    victim, victim_expires = offset, slot_expires
+
+            offset = target if target is not None else victim
+            CACHE_SLOT.pack_into(buf, offset, SLOT_USED, key_hash, len(encoded), encoded, expires, len(data))
+            start = offset + CACHE_SLOT.size
+            buf[start:start + len(data)] = data
+
+    def delete(self, key: str):
+        encoded = self._encode_key(key)
+        key_hash = self._hash(encoded)
+
+        with self._lock(key_hash):
+            buf = self.shm.buf
+            for offset in self._probe(key_hash, self.cache_stripe_size, self.cache_slot_size, self.counters_size):
+                state, slot_hash, key_size, slot_key, _, _ = CACHE_SLOT.unpack_from(buf, offset)
+                if state == SLOT_EMPTY:
+                    return
+                if state == SLOT_USED and slot_hash == key_hash and slot_key[:key_size] == encoded:
+                    buf[offset] = SLOT_DELETED
+                    return
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        The counters of every worker and the usage of the cache, aggregated across the machine
+        """
+        counters: Dict[str, int] = {}
+        cached = 0
+        now = time.time()
+
+        for stripe in range(self.stripes):
+            with self._locked(stripe):
+                buf = self.shm.buf
+                for i in range(self.counter_stripe_size):
+                    offset = (stripe * self.counter_stripe_size + i) * self.counter_slot_size
+                    used, _, key_size, slot_key, value = COUNTER_SLOT.unpack_from(buf, offset)
+                    if used:
+                        counters[slot_key[:key_size].decode("utf-8")] = value
+                for i in range(self.cache_stripe_size):
+                    offset = self.counters_size + (stripe * self.cache_stripe_size + i) * self.cache_slot_size
+                    state, _, _, _, expires, _ = CACHE_SLOT.unpack_from(buf, offset)
+                    if state == SLOT_USED and not (expires and expires <= now):
+                        cached += 1
+
+        return {
+            "counters": counters,
+            "cache": {"size": cached, "slots": self.cache_stripe_size * self.stripes},
+        }
@@ -1,4 +1,29 @@
-from blinker import signal
+import sys
+from typing import Any
 
-request_start = signal("request_started")
-request_finish = signal("request_finished")
+# Signal attribute name -> blinker signal name
+SIGNALS = {
+    "request_start": "request_started",
+    "request_finish": "request_finished",
+}
+
+
+def __getattr__(name: str) -> Any:
+    """
+    blinker is imported the first time a signal is accessed, usually to connect a receiver
+    """
+    if name in SIGNALS:
+        from blinker import signal
+
+        globals()[name] = signal(SIGNALS[name])
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+async def send_async(name: str, sender: Any, **kwargs: Any) -> None:
+    """
+    Sends a signal, if blinker has never been imported no receiver can be connected and nothing is done
+    """
+    if "blinker" not in sys.modules:
+        return
+    await __getattr__(name).send_async(sender, **kwargs)
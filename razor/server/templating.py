@@ -0,0 +1,121 @@
+import os
+from typing import Any, Dict, Optional, Union, TYPE_CHECKING
+
+from .response import Response, StreamResponse
+from .constants import DEFAULT_CODING
+from .types import AsgiScope, AsgiReceive, AsgiSend
+
+if TYPE_CHECKING:
+    import jinja2
+
+
+def import_jinja2():
+    """
+    jinja2 is an optional dependency, install it with `pip install http-razor[templates]`
+    """
+    try:
+        import jinja2
+    except ImportError:
+        raise RuntimeError("Template rendering requires the `jinja2` package, "
+                           "install it with `pip install http-razor[templates]`") from None
+    return jinja2
+
+
+class TemplateLoader:
+    """
+    Loads templates from a directory, each template is compiled once and cached
+
+    With auto_reload a cached template is compiled again when its file changes on disk,
+    it defaults to the debug mode of the application when the first template is loaded
+
+    directory   : The directory of the templates
+    auto_reload : Whether the modification time of the files is checked on each load
+    cache_size  : The number of compiled templates kept
+    options     : Passed to `jinja2.Environment`
+    """
+
+    def __init__(self, directory: Union[str, os.PathLike], auto_reload: Optional[bool] = None,
+                 cache_size: int = 400, **options):
+        self.directory = directory
+        self.auto_reload = auto_reload
+        self.cache_size = cache_size
+        self.options = options
+        self._environment: Optional["jinja2.Environment"] = None
+
+    def create_environment(self, auto_reload: bool) -> "jinja2.Environment":
+        jinja2 = import_jinja2()
+
+        options = {
+            "autoescape": jinja2.select_autoescape(),
+            **self.options,
+            "loader": jinja2.FileSystemLoader(self.directory),
+            "auto_reload": auto_reload,
+            "cache_size": self.cache_size,
+            # Templates render with render_async and generate_async, so they never block the event loop
+            "enable_async": True,
+        }
+        return jinja2.Environment(**options)
+
+    def get_environment(self, debug: bool = False) -> "jinja2.Environment":
+        if self._environment is None:
+            auto_reload = debug if self.auto_reload is None else self.auto_reload
+            self._environment = self.create_environment(auto_reload)
+        return self._environment
+
+    def get_template(self, name: str, debug: bool = False) -> "jinja2.Template":
+        return self.get_environment(debug).get_template(name)
+
+
+class TemplateResponse(StreamResponse):
+    """
+    Renders a compiled template, usually created with `Application.render`
+
+    By default the page is rendered completely and sent with a content-length.
+    With stream=True the chunks are sent while the template renders,
+    so a large page starts to arrive before the end of it is rendered
+
+    @app.route("/users")
+    async def users():
+        return app.render("users.html", {"users": await load_users()}, stream=True)
+    """
+
+    content_type = "text/html"
+
+    # The small pieces generated by the template are joined into chunks of at least this many characters
+    BUFFER_SIZE = 8 * 1024
+
+    def __init__(
+        self,
+        template: "jinja2.Template",
+        context: Optional[Dict[str, Any]] = None,
+        *,
+        stream: bool = False,
+        **kwargs
+    ):
+        self.template = template
+        self.context = context or {}
+        self.stream = stream
+        super().__init__(None, **kwargs)
+
+    async def iter_content(self):
+        buffer, size = [], 0
+        async for piece in self.template.generate_async(self.context):
+            buffer.append(piece)
+            size += len(piece)
+            if size >= self.BUFFER_SIZE:
+                yield "".join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield "".join(buffer)
+
+    async def prepare(self) -> None:
+        # A streamed page can only fail while it is sent, the status is already out by then
+        if not self.stream and self.content is None:
+            self.content = (await self.template.render_async(self.context)).encode(DEFAULT_CODING)
+
+    async def __call__(self, scope: AsgiScope, receive: AsgiReceive, send: AsgiSend) -> None:
+        if self.stream:
+            return await super().__call__(scope, receive, send)
+
+        await self.prepare()
+        await Response.__call__(self, scope, receive, send)
@@ -40,6 +40,7 @@ class AsgiScope(TypedDict):
 AsgiMessage = Mapping[str, Any]
 AsgiReceive = Callable[[], Awaitable[AsgiMessage]]
 AsgiSend = Callable[[AsgiMessage], Awaitable[None]]
+AsgiApp = Callable[[AsgiScope, AsgiReceive, AsgiSend], Awaitable[None]]
 
 JsonMapping = Mapping[str, Any]
 
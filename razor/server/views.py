@@ -1,17 +1,63 @@
 class View:
+    http_method_names = ("get", "post", "put", "patch", "delete", "head", "options", "trace")
+
     def __init__(self, **kwargs):
         for key, value in kwargs.items():
             setattr(self, key, value)
 
+    @classmethod
+    def get_handler_table(cls):
+        """
+        Maps each allowed HTTP method to the name of its handler method and its Request parameter
+        HEAD runs the get handler when the view does not define head
+        """
+        from .request import get_request_parameter
+
+        handlers = {}
+        for method in cls.http_method_names:
+            name = method
+            if getattr(cls, name, None) is None and method == "head":
+                name = "get"
+            handler = getattr(cls, name, None)
+            if handler is not None:
+                handlers[method.upper()] = (name, get_request_parameter(handler))
+        return handlers
+
     @classmethod
     def as_view(cls, **initkwargs):
-        async def view(*args, **kwargs):
+        from .response import Response, ErrorResponse, HTTPStatus
+
+        # Resolved once instead of per request
+        handlers = cls.get_handler_table()
+        allow = ", ".join(sorted({*handlers, "OPTIONS"}))
+
+        # OPTIONS and disallowed methods are answered without creating the view.
+        # Only the headers and the error page are prebuilt, after_request hooks may change the
+        # response so every request gets its own
+        allow_headers = (("allow", allow),)
+        not_allowed_page = ErrorResponse(HTTPStatus.METHOD_NOT_ALLOWED).content
+
+        def not_allowed_response():
+            return ErrorResponse(HTTPStatus.METHOD_NOT_ALLOWED, content=not_allowed_page, headers=allow_headers)
+
+        async def view(*args, request, **kwargs):
+            if request.method not in handlers:
+                if request.method == "OPTIONS":
+                    return Response(b"", headers=allow_headers)
+                return not_allowed_response()
+
             self = cls(**initkwargs)
+            self.request = request
+            self.handlers = handlers
+            self.not_allowed_response = not_allowed_response
             self.setup(*args, **kwargs)
             return await self.dispatch(*args, **kwargs)
 
         view.view_class = cls
         view.view_initkwargs = initkwargs
+        view.allowed_methods = allow
+        # The Request is always injected, so dispatch never goes through the proxy
+        view.__request_param__ = "request"
 
         view.__doc__ = cls.__doc__
         view.__module__ = cls.__module__
@@ -21,16 +67,14 @@ class View:
         return view
 
     async def dispatch(self, *args, **kwargs):
+        entry = self.handlers.get(self.request.method)
+        if entry is None:
+            return self.not_allowed_response()
 
-        from .globals import request
-        from .response import ErrorResponse, HTTPStatus
-
-        if hasattr(self, request.method.lower()):
-            handler = getattr(self, request.method.lower())
-            return await handler(*args, **kwargs)
-
-        return ErrorResponse(HTTPStatus.METHOD_NOT_ALLOWED)
+        name, request_param = entry
+        if request_param is not None:
+            kwargs[request_param] = self.request
+        return await getattr(self, name)(*args, **kwargs)
 
     def setup(self, *args, **kwargs):
-        if hasattr(self, "get") and not hasattr(self, "head"):
-            self.head = self.get
+        pass
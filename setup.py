@@ -10,15 +10,19 @@ setup(
     packages=find_packages(),
     include_package_data=True,
     install_requires=[
-        'aiofiles',
         'http-router',
         'uvicorn',
+        'h11',
         'uvloop',
         'multidict',
         'markupsafe',
         'python-multipart',
         'blinker '
     ],
+    extras_require={
+        'msgpack': ['msgpack'],
+        'templates': ['jinja2'],
+    },
     author="askfiy",
     author_email="c2323182108@gmail.com",
     url="https://github.com/askfiy/razor",
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The tests run against the working tree, not an installed copy
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,41 @@
+import json
+import asyncio
+
+import pytest
+
+from razor.server import Application, JsonResponse
+
+
+async def post(app: Application, path: str, body):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": json.dumps(body).encode(), "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": path, "query_string": b"", "headers": [], "state": {}}
+    await app(scope, receive, send)
+    start = next(message for message in messages if message["type"] == "http.response.start")
+    return start["status"], json.loads(b"".join(message.get("body", b"") for message in messages[1:]))
+
+
+@pytest.mark.parametrize("nested_path", ["/_batch", "/_batch/"])
+def test_batch_cannot_contain_a_batch(nested_path):
+    app = Application(__name__, trim_last_slash=True)
+    app.enable_batch("/_batch")
+
+    @app.route("/ping")
+    async def ping():
+        return JsonResponse({"pong": True})
+
+    inner = [{"path": "/ping"}]
+    status, results = asyncio.run(post(app, "/_batch", [
+        {"path": "/ping"},
+        {"method": "POST", "path": nested_path, "body": inner},
+    ]))
+    assert status == 200
+    assert results[0]["body"] == {"pong": True}
+    assert results[1]["status"] == 400
+    assert results[1]["body"] == {"error": "A batch cannot contain a batch"}
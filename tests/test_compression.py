@@ -0,0 +1,36 @@
+import zlib
+
+import pytest
+
+from razor.server.compression import Decompressor
+from razor.server.exceptions import RequestDecodingException
+
+BODY = b'{"name": "razor", "values": [1, 2, 3]}' * 100
+
+
+def compress(data, wbits):
+    compressor = zlib.compressobj(wbits=wbits)
+    return compressor.compress(data) + compressor.flush()
+
+
+def decompress(encoding, chunks):
+    decompressor = Decompressor(encoding)
+    output = b"".join(b"".join(decompressor.decompress(chunk)) for chunk in chunks)
+    return output + decompressor.flush()
+
+
+@pytest.mark.parametrize("encoding, wbits", [
+    ("deflate", -zlib.MAX_WBITS),
+    ("deflate", zlib.MAX_WBITS),
+    ("gzip", 16 + zlib.MAX_WBITS),
+])
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 1024])
+def test_decompress_in_chunks(encoding, wbits, chunk_size):
+    body = compress(BODY, wbits)
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+    assert decompress(encoding, chunks) == BODY
+
+
+def test_truncated_deflate_header():
+    with pytest.raises(RequestDecodingException):
+        decompress("deflate", [b"x"])
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from razor.server.request import Request
+
+
+def make_request(body: bytes, content_type: str, chunk_size: int = 16) -> Request:
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)] or [b""]
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": index < len(chunks) - 1}
+        for index, chunk in enumerate(chunks)
+    ]
+
+    async def receive():
+        return messages.pop(0)
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/",
+        "query_string": b"",
+        "headers": [
+            (b"content-type", content_type.encode("latin-1")),
+            (b"content-length", str(len(body)).encode("latin-1")),
+        ],
+    }
+    return Request(scope, receive, None)
+
+
+def multipart_body(*parts) -> bytes:
+    body = b""
+    for name, filename, data in parts:
+        headers = f'Content-Disposition: form-data; name="{name}"'
+        if filename is not None:
+            headers += f'; filename="{filename}"\r\nContent-Type: text/plain'
+        body += f"--B\r\n{headers}\r\n\r\n".encode() + data + b"\r\n"
+    return body + b"--B--\r\n"
+
+
+def test_urlencoded_form_then_files_and_body():
+    async def main():
+        request = make_request(b"a=1&b=2", "application/x-www-form-urlencoded")
+        form = await request.form()
+        assert form["a"] == "1"
+        assert len(await request.files()) == 0
+        assert await request.form() is form
+        assert await request.body() == b"a=1&b=2"
+
+    asyncio.run(main())
+
+
+def test_multipart_form_without_files_then_files():
+    async def main():
+        request = make_request(multipart_body(("a", None, b"1")), "multipart/form-data; boundary=B")
+        assert (await request.form())["a"] == "1"
+        assert len(await request.files()) == 0
+
+    asyncio.run(main())
+
+
+def test_multipart_body_after_form_fails_clearly():
+    async def main():
+        request = make_request(multipart_body(("f", "a.txt", b"data")), "multipart/form-data; boundary=B")
+        files = await request.files()
+        assert files["f"].read() == b"data"
+        with pytest.raises(RuntimeError, match="streamed"):
+            await request.body()
+
+    asyncio.run(main())
@@ -0,0 +1,17 @@
+import os
+import sys
+import subprocess
+
+# Optional or heavy packages that `import razor.server` must not load
+LAZY_MODULES = ("uvicorn", "multipart", "python_multipart", "blinker", "markupsafe", "aiofiles", "jinja2", "msgpack")
+
+
+def test_import_does_not_load_lazy_modules():
+    # A fresh interpreter, the modules imported by pytest itself do not count
+    code = (
+        "import sys, razor.server\n"
+        f"print(' '.join(sorted(m for m in sys.modules if m.split('.')[0] in {LAZY_MODULES!r})))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.stdout.split() == []
@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+from razor.server.request import Request
+from razor.server.exceptions import RequestEntityTooLargeException
+
+
+def make_request(chunks) -> Request:
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": index < len(chunks) - 1}
+        for index, chunk in enumerate(chunks)
+    ]
+
+    async def receive():
+        return messages.pop(0)
+
+    return Request({"type": "http", "method": "POST", "path": "/", "query_string": b"", "headers": []}, receive, None)
+
+
+async def collect(request: Request, **kwargs):
+    return [record async for record in request.iter_json_lines(**kwargs)]
+
+
+def test_records_split_across_chunks():
+    body = b'{"a": 1}\n\n{"b": [1, 2]}\n{"c": "x"}'
+    chunks = [body[i:i + 3] for i in range(0, len(body), 3)]
+    assert asyncio.run(collect(make_request(chunks))) == [{"a": 1}, {"b": [1, 2]}, {"c": "x"}]
+
+
+def test_line_size_limit():
+    chunks = [b'{"a": "' + b"x" * 100, b"x" * 100 + b'"}\n']
+    with pytest.raises(RequestEntityTooLargeException):
+        asyncio.run(collect(make_request(chunks), max_line_size=150))
+    assert len(asyncio.run(collect(make_request(chunks), max_line_size=None))) == 1
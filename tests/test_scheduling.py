@@ -0,0 +1,36 @@
+import asyncio
+
+from razor.server import Application
+
+
+async def run_lifespan(app: Application, state: dict, seconds: float):
+    messages = asyncio.Queue()
+    sent = []
+    await messages.put({"type": "lifespan.startup"})
+
+    async def send(message):
+        sent.append(message["type"])
+
+    lifespan = asyncio.ensure_future(app({"type": "lifespan", "state": state}, messages.get, send))
+    await asyncio.sleep(seconds)
+    await messages.put({"type": "lifespan.shutdown"})
+    await lifespan
+    return sent
+
+
+def test_jobs_start_after_the_startup_hooks():
+    app = Application(__name__)
+    seen = []
+
+    @app.on_startup
+    async def database(state):
+        await asyncio.sleep(0.1)
+        state["database"] = "connected"
+
+    @app.every(0.01)
+    async def refresh(state):
+        seen.append(state.get("database"))
+
+    sent = asyncio.run(run_lifespan(app, {}, 0.3))
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+    assert seen and set(seen) == {"connected"}
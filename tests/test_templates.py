@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from razor.server import Application
+from razor.server.response import TextResponse
+
+jinja2 = pytest.importorskip("jinja2")
+
+
+def make_app(tmp_path) -> Application:
+    (tmp_path / "page.html").write_text("<h1>{{ title }}</h1>")
+    app = Application(__name__)
+    app.configure_templates(tmp_path, undefined=jinja2.StrictUndefined)
+
+    @app.route("/page")
+    async def page():
+        return app.render("page.html", {})
+
+    return app
+
+
+async def get(app: Application, path: str):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": [], "state": {}}
+    await app(scope, receive, send)
+    start = next(message for message in messages if message["type"] == "http.response.start")
+    return start["status"], b"".join(message.get("body", b"") for message in messages[1:])
+
+
+def test_render_error_is_a_server_error(tmp_path):
+    app = make_app(tmp_path)
+    status, _ = asyncio.run(get(app, "/page"))
+    assert status == 500
+
+
+def test_render_error_reaches_exception_hooks(tmp_path):
+    app = make_app(tmp_path)
+    errors = []
+
+    @app.on_exception
+    async def exception_handle(exc):
+        errors.append(exc)
+        return TextResponse("render failed", status_code=503)
+
+    assert asyncio.run(get(app, "/page")) == (503, b"render failed")
+    assert isinstance(errors[0], jinja2.UndefinedError)